@@ -9,7 +9,14 @@ REGION = "region"
 REGION_NAME = "region_name"
 GLOBAL="global"
 ITEM_AT_CURRENT_REGION_NAME = "item_at_current_region_name"
+IN_REGION = "in_region"
 IS_INTEREST_REGION_CROSSED = "is_interested_region_crossed"
+CROSSED_LINES = "crossed_lines"
+# Line region object_moving_direction values (image axes, y grows downwards)
+LEFT_TO_RIGHT = "left_to_right"
+RIGHT_TO_LEFT = "right_to_left"
+UP_TO_DOWN = "up_to_down"
+DOWN_TO_UP = "down_to_up"
 BBOX = "bbox"
 OTHER="other"
 OBB_XYWHR = "obb_xywhr"
@@ -0,0 +1,143 @@
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from constants.detections_constant import (
+    BBOX, CENTRE, GLOBAL, IN_REGION, ITEM_AT_CURRENT_REGION_NAME, REGION_NAME
+)
+from services.common.models.pipe_structure import Region, RegionType
+
+
+class CompiledRegions:
+    """
+    Polygon and bounding-box regions compiled once into NumPy arrays.
+
+    Every polygon is padded to the largest vertex count by repeating its
+    last vertex (the padding edges have zero length and never cross), so
+    membership of N points in R regions is one crossing-number test over
+    an R x V vertex array. A bounding-box prefilter limits the edge test to
+    point/region pairs that can match; for bounding-box regions the
+    prefilter is the membership. Line regions are not areas and are skipped.
+    """
+
+    def __init__(self, regions: Sequence[Region]):
+        """
+        Compile pydantic regions.
+
+        Args:
+            regions: Regions as configured; their order decides the primary
+                region of a point that lies in several regions
+        """
+        area_regions = [region for region in regions if region.type != RegionType.Line]
+        self.names: List[str] = [region.name for region in area_regions]
+
+        polygons = []
+        for region in area_regions:
+            if region.type == RegionType.POLYGON:
+                polygons.append(np.asarray([(p.x, p.y) for p in region.points], dtype=np.float64))
+            else:
+                c = region.coordinates
+                polygons.append(np.asarray(
+                    [(c.x_min, c.y_min), (c.x_max, c.y_min), (c.x_max, c.y_max), (c.x_min, c.y_max)],
+                    dtype=np.float64,
+                ))
+
+        n_regions = len(polygons)
+        n_vertices = max((len(polygon) for polygon in polygons), default=0)
+
+        # R x V vertex arrays, padded with each polygon's last vertex
+        self._vx = np.zeros((n_regions, n_vertices))
+        self._vy = np.zeros((n_regions, n_vertices))
+        for r, polygon in enumerate(polygons):
+            self._vx[r, :len(polygon)] = polygon[:, 0]
+            self._vx[r, len(polygon):] = polygon[-1, 0]
+            self._vy[r, :len(polygon)] = polygon[:, 1]
+            self._vy[r, len(polygon):] = polygon[-1, 1]
+
+        # Edge i runs from vertex i - 1 to vertex i (wraps to close the polygon)
+        self._vx_prev = np.roll(self._vx, 1, axis=1)
+        self._vy_prev = np.roll(self._vy, 1, axis=1)
+        # Edge slope dx / dy, precomputed for the crossing test
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._slope = (self._vx_prev - self._vx) / (self._vy_prev - self._vy)
+
+        # R x 4 region bounding boxes (x_min, y_min, x_max, y_max)
+        self._bounds = np.stack([
+            self._vx.min(axis=1), self._vy.min(axis=1), self._vx.max(axis=1), self._vy.max(axis=1)
+        ], axis=1) if n_regions else np.zeros((0, 4))
+        self._is_box = np.asarray(
+            [region.type == RegionType.BOUNDING_BOX for region in area_regions], dtype=bool
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """
+        Membership of many points in all regions.
+
+        Args:
+            points: N x 2 points (x, y)
+
+        Returns:
+            N x R boolean matrix
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        px = points[:, 0:1]
+        py = points[:, 1:2]
+
+        # Bounding-box prefilter (exact for bounding-box regions)
+        inside = (
+            (px >= self._bounds[:, 0]) & (px <= self._bounds[:, 2])
+            & (py >= self._bounds[:, 1]) & (py <= self._bounds[:, 3])
+        )
+
+        # Crossing-number test for the candidate point/polygon pairs only
+        point_idx, region_idx = np.nonzero(inside & ~self._is_box)
+        if len(point_idx):
+            cx = px[point_idx]
+            cy = py[point_idx]
+            vx, vy = self._vx[region_idx], self._vy[region_idx]
+            vy_prev = self._vy_prev[region_idx]
+
+            straddles = (vy > cy) != (vy_prev > cy)
+            with np.errstate(invalid="ignore"):
+                x_cross = vx + (cy - vy) * self._slope[region_idx]
+            crossings = np.count_nonzero(straddles & (cx < x_cross), axis=1)
+            inside[point_idx, region_idx] = (crossings % 2) == 1
+
+        return inside
+
+    def annotate(self, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Set region fields on detections from their centre (or bbox centre):
+            IN_REGION: whether the centre lies in any region
+            REGION_NAME: first containing region, or GLOBAL
+            ITEM_AT_CURRENT_REGION_NAME: names of all containing regions
+
+        Returns:
+            The same detections
+        """
+        located = []
+        points = []
+        for detection in detections:
+            centre = detection.get(CENTRE)
+            if centre is None:
+                bbox = detection.get(BBOX)
+                if not bbox:
+                    continue
+                centre = ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+            located.append(detection)
+            points.append(centre[:2])
+
+        if not located:
+            return detections
+
+        membership = self.contains(np.asarray(points)) if len(self) else np.zeros((len(located), 0), dtype=bool)
+        for detection, row in zip(located, membership):
+            region_names = [self.names[r] for r in np.flatnonzero(row)]
+            detection[IN_REGION] = bool(region_names)
+            detection[REGION_NAME] = region_names[0] if region_names else GLOBAL
+            detection[ITEM_AT_CURRENT_REGION_NAME] = region_names
+
+        return detections
@@ -0,0 +1,240 @@
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from constants.detections_constant import (
+    BBOX, CENTRE, CROSSED_LINES, DETECT_TRACK_ID, IS_INTEREST_REGION_CROSSED, OTHER,
+    LEFT_TO_RIGHT, RIGHT_TO_LEFT, UP_TO_DOWN, DOWN_TO_UP,
+)
+from services.common.models.pipe_structure import Region, RegionType
+
+
+class LineCrossingEngine:
+    """
+    Counts tracks crossing RegionType.Line regions.
+
+    Each track's previous centre is kept in preallocated arrays. Every frame,
+    the movement segments of all tracks are intersected with all lines in
+    one vectorised pass of signed side (cross-product) tests, giving a
+    tracks x lines crossing matrix. A crossing counts when the movement
+    matches the line's object_moving_direction and the same track has not
+    crossed the same line within debounce_frames.
+    """
+
+    # Movement axis and sign required by each object_moving_direction
+    _DIRECTION_AXES = {
+        LEFT_TO_RIGHT: (0, 1.0),
+        RIGHT_TO_LEFT: (0, -1.0),
+        UP_TO_DOWN: (1, 1.0),
+        DOWN_TO_UP: (1, -1.0),
+    }
+
+    def __init__(
+            self,
+            regions: Sequence[Region],
+            debounce_frames: int = 15,
+            max_missed_frames: int = 30,
+            initial_capacity: int = 256,
+    ):
+        """
+        Compile line regions and initialise track state.
+
+        Args:
+            regions: Configured regions; only RegionType.Line regions are used
+            debounce_frames: Frames during which a track cannot recount the same line
+            max_missed_frames: Frames after which an unseen track's position is dropped
+            initial_capacity: Initial number of track rows; grows by doubling
+        """
+        lines = [region for region in regions if region.type == RegionType.Line]
+        self.names: List[str] = [line.name for line in lines]
+        self.debounce_frames = debounce_frames
+        self.max_missed_frames = max_missed_frames
+
+        # L x 2 endpoints and L x 2 direction vectors
+        self._starts = np.asarray(
+            [(line.line_points[0].x, line.line_points[0].y) for line in lines], dtype=np.float64
+        ).reshape(-1, 2)
+        ends = np.asarray(
+            [(line.line_points[1].x, line.line_points[1].y) for line in lines], dtype=np.float64
+        ).reshape(-1, 2)
+        self._vectors = ends - self._starts
+
+        # Direction constraint per line as (axis, sign); sign 0 accepts any movement
+        axes = np.zeros(len(lines), dtype=np.int64)
+        signs = np.zeros(len(lines))
+        for i, line in enumerate(lines):
+            direction = (line.object_moving_direction or "").lower().strip()
+            if direction in self._DIRECTION_AXES:
+                axes[i], signs[i] = self._DIRECTION_AXES[direction]
+            else:
+                print(f"[LineCrossingEngine] Line '{line.name}' has unknown direction "
+                      f"'{line.object_moving_direction}'; counting both ways")
+        self._direction_axes = axes
+        self._direction_signs = signs
+
+        self.counts = np.zeros(len(lines), dtype=np.int64)
+        self._frame_index = 0
+        self._allocate(max(1, initial_capacity))
+
+    def _allocate(self, capacity: int) -> None:
+        """Allocate empty track buffers with the given number of rows."""
+        self._positions = np.zeros((capacity, 2), dtype=np.float64)
+        self._last_seen = np.zeros(capacity, dtype=np.int64)
+        self._last_crossed = np.full((capacity, len(self.names)), np.iinfo(np.int64).min // 2, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._row_track_ids: List[Optional[Hashable]] = [None] * capacity
+        self._rows: Dict[Hashable, int] = {}
+        self._free_rows: List[int] = list(range(capacity - 1, -1, -1))
+
+    def _grow(self) -> None:
+        """Double the number of track rows, keeping existing tracks in place."""
+        capacity = len(self._active)
+        new_capacity = capacity * 2
+
+        def grown(array: np.ndarray, fill: int = 0) -> np.ndarray:
+            out = np.full((new_capacity, *array.shape[1:]), fill, dtype=array.dtype)
+            out[:capacity] = array
+            return out
+
+        self._positions = grown(self._positions)
+        self._last_seen = grown(self._last_seen)
+        self._last_crossed = grown(self._last_crossed, np.iinfo(np.int64).min // 2)
+        self._active = grown(self._active)
+        self._row_track_ids.extend([None] * capacity)
+        self._free_rows.extend(range(new_capacity - 1, capacity - 1, -1))
+
+    def _row_for(self, track_id: Hashable) -> int:
+        """Return the buffer row of a track, claiming a free row for new tracks."""
+        row = self._rows.get(track_id)
+        if row is not None:
+            return row
+
+        if not self._free_rows:
+            self._grow()
+
+        row = self._free_rows.pop()
+        self._rows[track_id] = row
+        self._row_track_ids[row] = track_id
+        self._active[row] = False  # no previous position yet
+        self._last_crossed[row] = np.iinfo(np.int64).min // 2
+        return row
+
+    def _evict_stale_tracks(self) -> None:
+        """Release rows of tracks unseen for more than max_missed_frames."""
+        tracked = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+        stale = tracked[self._frame_index - self._last_seen[tracked] > self.max_missed_frames]
+        for row in stale.tolist():
+            del self._rows[self._row_track_ids[row]]
+            self._row_track_ids[row] = None
+            self._free_rows.append(row)
+        self._active[stale] = False
+
+    def _crossings(self, previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+        """
+        Segment intersection of K movement segments with all L lines.
+
+        Returns:
+            K x L boolean matrix
+        """
+        starts = self._starts[None, :, :]
+        vectors = self._vectors[None, :, :]
+        p0 = previous[:, None, :]
+        p1 = current[:, None, :]
+
+        # Which side of each line the old and new positions are on
+        side0 = vectors[..., 0] * (p0[..., 1] - starts[..., 1]) - vectors[..., 1] * (p0[..., 0] - starts[..., 0])
+        side1 = vectors[..., 0] * (p1[..., 1] - starts[..., 1]) - vectors[..., 1] * (p1[..., 0] - starts[..., 0])
+        changes_side = (side0 > 0) != (side1 > 0)
+
+        # Which side of the movement segment each line endpoint is on
+        movement = p1 - p0
+        ends = starts + vectors
+        t0 = movement[..., 0] * (starts[..., 1] - p0[..., 1]) - movement[..., 1] * (starts[..., 0] - p0[..., 0])
+        t1 = movement[..., 0] * (ends[..., 1] - p0[..., 1]) - movement[..., 1] * (ends[..., 0] - p0[..., 0])
+        within_line = t0 * t1 <= 0
+
+        return changes_side & within_line
+
+    def update(self, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Process one frame of tracked detections.
+
+        Sets IS_INTEREST_REGION_CROSSED on every tracked detection and
+        OTHER[CROSSED_LINES] on detections that crossed a line this frame.
+
+        Args:
+            detections: Detections with DETECT_TRACK_ID and CENTRE (or BBOX)
+
+        Returns:
+            The same detections
+        """
+        self._frame_index += 1
+        self._evict_stale_tracks()
+
+        tracked = []
+        rows = []
+        centres = []
+        for detection in detections:
+            track_id = detection.get(DETECT_TRACK_ID)
+            if track_id is None:
+                continue
+            centre = detection.get(CENTRE)
+            if centre is None:
+                bbox = detection.get(BBOX)
+                if not bbox:
+                    continue
+                centre = ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+            tracked.append(detection)
+            rows.append(self._row_for(track_id))
+            centres.append(centre[:2])
+
+        if not tracked:
+            return detections
+
+        rows = np.asarray(rows, dtype=np.int64)
+        current = np.asarray(centres, dtype=np.float64)
+        crossed = np.zeros((len(rows), len(self.names)), dtype=bool)
+
+        has_previous = self._active[rows]
+        if has_previous.any() and len(self.names):
+            moving_rows = rows[has_previous]
+            previous = self._positions[moving_rows]
+            moving = current[has_previous]
+
+            hits = self._crossings(previous, moving)
+
+            # Direction constraint: movement along the line's axis must have the required sign
+            movement = moving - previous
+            along = movement[:, self._direction_axes] * self._direction_signs
+            hits &= (along > 0) | (self._direction_signs == 0)
+
+            # Debounce repeated crossings of the same line by the same track
+            hits &= self._frame_index - self._last_crossed[moving_rows] > self.debounce_frames
+
+            self._last_crossed[moving_rows] = np.where(hits, self._frame_index, self._last_crossed[moving_rows])
+            self.counts += hits.sum(axis=0)
+            crossed[has_previous] = hits
+
+        self._positions[rows] = current
+        self._last_seen[rows] = self._frame_index
+        self._active[rows] = True
+
+        any_crossed = crossed.any(axis=1)
+        for detection, row_crossed, hit in zip(tracked, crossed, any_crossed.tolist()):
+            detection[IS_INTEREST_REGION_CROSSED] = hit
+            if hit:
+                if not isinstance(detection.get(OTHER), dict):
+                    detection[OTHER] = {}
+                detection[OTHER][CROSSED_LINES] = [self.names[i] for i in np.flatnonzero(row_crossed)]
+
+        return detections
+
+    def get_counts(self) -> Dict[str, int]:
+        """Crossing count per line name."""
+        return {name: int(count) for name, count in zip(self.names, self.counts)}
+
+    def reset(self) -> None:
+        """Clear counters and track positions (e.g. for a new video)."""
+        self.counts[:] = 0
+        self._frame_index = 0
+        self._allocate(len(self._active))
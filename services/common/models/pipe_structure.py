@@ -3,6 +3,8 @@ from typing import Any,Optional
 from typing import List
 from enum import Enum
 
+from constants.detections_constant import LEFT_TO_RIGHT, RIGHT_TO_LEFT, UP_TO_DOWN, DOWN_TO_UP
+
 class RegionType(str, Enum):
     POLYGON = "polygon"
     BOUNDING_BOX = "bounding_box"
@@ -52,6 +54,6 @@ class Region(BaseModel):
             if self.object_moving_direction is None:
                 raise ValueError(
                     f"object_moving_direction is null, when working with line tool it must have object_moving_direction object"
-                    f"any one from the values given [{RIGHT_TO_LEFT},{RIGHT_TO_LEFT},{UP_TO_DOWN},{DOWN_TO_UP}]")
+                    f"any one from the values given [{LEFT_TO_RIGHT},{RIGHT_TO_LEFT},{UP_TO_DOWN},{DOWN_TO_UP}]")
 
         return self
\ No newline at end of file
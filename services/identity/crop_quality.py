@@ -0,0 +1,99 @@
+# services/identity/crop_quality.py
+from typing import Any, Optional
+
+import numpy as np
+
+from constants.detections_constant import CONFIDENCE
+
+# Crops with a short side at or above this many pixels get full size score
+FULL_QUALITY_SIDE_PX = 128
+# Laplacian variance at which a crop counts as fully sharp
+FULL_QUALITY_SHARPNESS = 300.0
+
+OCCLUSION = "occlusion"
+
+
+def _extract_crop(person_data: Any) -> Optional[np.ndarray]:
+    """Return the image crop of person_data (ndarray, or dict with "crop"/"image")."""
+    if isinstance(person_data, np.ndarray):
+        return person_data
+    if isinstance(person_data, dict):
+        for key in ("crop", "image"):
+            crop = person_data.get(key)
+            if isinstance(crop, np.ndarray):
+                return crop
+    return None
+
+
+def _to_uint8(crop: np.ndarray) -> np.ndarray:
+    """Return the crop as uint8; float crops in [0, 1] are scaled to [0, 255]."""
+    if crop.dtype == np.uint8:
+        return crop
+    if np.issubdtype(crop.dtype, np.floating) and crop.size and float(crop.max()) <= 1.0:
+        crop = crop * 255.0
+    return np.clip(crop, 0, 255).astype(np.uint8)
+
+
+def crop_quality(person_data: Any) -> Optional[float]:
+    """
+    Score how useful a crop is for re-identification, in [0, 1].
+
+    Product of four factors: size (short side), sharpness (variance of the
+    Laplacian), visibility (1 - person_data["occlusion"]) and detector
+    confidence (person_data[CONFIDENCE]). Missing factors count as 1.
+
+    Args:
+        person_data: Crop as BGR ndarray, or dict holding it under "crop"/"image"
+
+    Returns:
+        Quality score, or None when no crop is available (quality unknown)
+    """
+    crop = _extract_crop(person_data)
+    if crop is None or crop.size == 0:
+        return None
+
+    height, width = crop.shape[:2]
+    size_score = min(1.0, min(height, width) / FULL_QUALITY_SIDE_PX)
+
+    gray = crop.astype(np.float32)
+    if gray.ndim == 3:
+        gray = gray @ np.array([0.114, 0.587, 0.299], dtype=np.float32)[:gray.shape[2]]
+    laplacian = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:] - 4.0 * gray[1:-1, 1:-1]
+    )
+    sharpness = float(laplacian.var()) if laplacian.size else 0.0
+    sharpness_score = min(1.0, sharpness / FULL_QUALITY_SHARPNESS)
+
+    visibility_score = 1.0
+    confidence_score = 1.0
+    if isinstance(person_data, dict):
+        visibility_score = 1.0 - float(np.clip(person_data.get(OCCLUSION, 0.0), 0.0, 1.0))
+        confidence_score = float(np.clip(person_data.get(CONFIDENCE, 1.0), 0.0, 1.0))
+
+    return size_score * sharpness_score * visibility_score * confidence_score
+
+
+def appearance_signature(person_data: Any) -> Optional[np.ndarray]:
+    """
+    Cheap appearance descriptor used to detect drift without embedding:
+    a normalised 4 x 4 x 4 colour histogram of the crop.
+
+    Returns:
+        float32 histogram (64,), or None when no colour crop is available
+    """
+    crop = _extract_crop(person_data)
+    if crop is None or crop.size == 0 or crop.ndim != 3 or crop.shape[2] < 3:
+        return None
+
+    bins = (_to_uint8(crop[..., :3]) >> 6).astype(np.int64)
+    codes = (bins[..., 0] << 4) | (bins[..., 1] << 2) | bins[..., 2]
+    hist = np.bincount(codes.ravel(), minlength=64).astype(np.float32)
+    return hist / hist.sum()
+
+
+def appearance_drift(previous: Optional[np.ndarray], current: Optional[np.ndarray]) -> float:
+    """Bhattacharyya distance in [0, 1] between two signatures (0 when either is missing)."""
+    if previous is None or current is None:
+        return 0.0
+    coefficient = float(np.sqrt(previous * current).sum())
+    return float(np.sqrt(max(0.0, 1.0 - min(coefficient, 1.0))))
@@ -0,0 +1,23 @@
+from abc import ABC, abstractmethod
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+class IEmbeddingStore(ABC):
+    """Interface for persisting global identity embeddings (e.g., Redis)."""
+
+    @abstractmethod
+    def save_many(self, global_ids: Sequence[str], embeddings: np.ndarray) -> None:
+        """Insert or overwrite the embeddings (N x D) of the given identities."""
+        pass
+
+    @abstractmethod
+    def delete(self, global_id: str) -> None:
+        """Remove an identity; unknown ids are ignored."""
+        pass
+
+    @abstractmethod
+    def load_all(self) -> Tuple[List[str], np.ndarray]:
+        """Return all stored identities as (ids, N x D embeddings)."""
+        pass
@@ -0,0 +1,28 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from services.identity.iembedding_store import IEmbeddingStore
+
+
+class InMemoryEmbeddingStore(IEmbeddingStore):
+    """Dictionary-backed embedding store for tests and single-process runs."""
+
+    def __init__(self):
+        self._embeddings: Dict[str, np.ndarray] = {}
+
+    def save_many(self, global_ids: Sequence[str], embeddings: np.ndarray) -> None:
+        for global_id, embedding in zip(global_ids, np.asarray(embeddings, dtype=np.float32)):
+            self._embeddings[str(global_id)] = embedding.copy()
+
+    def delete(self, global_id: str) -> None:
+        self._embeddings.pop(str(global_id), None)
+
+    def load_all(self) -> Tuple[List[str], np.ndarray]:
+        ids = list(self._embeddings)
+        if not ids:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return ids, np.stack([self._embeddings[global_id] for global_id in ids])
+
+    def __len__(self) -> int:
+        return len(self._embeddings)
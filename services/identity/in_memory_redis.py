@@ -0,0 +1,133 @@
+# services/identity/in_memory_redis.py
+import fnmatch
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+class InMemoryRedis:
+    """
+    In-process stand-in for the subset of the redis-py client used by
+    RedisIdentityStore (get/set/mget/delete/expire/scan_iter/pipeline).
+
+    Values expire on a monotonic clock. Every direct command and every
+    pipeline execute() counts as one round trip, so tests and benchmarks
+    can check how many trips a frame costs.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self.round_trips = 0
+
+    # -----------------------------
+    # Commands (one round trip each)
+    # -----------------------------
+
+    def get(self, key: str) -> Optional[bytes]:
+        self.round_trips += 1
+        return self._get(key)
+
+    def set(self, key: str, value: Any, ex: Optional[float] = None) -> bool:
+        self.round_trips += 1
+        return self._set(key, value, ex)
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        self.round_trips += 1
+        return [self._get(key) for key in keys]
+
+    def delete(self, *keys: str) -> int:
+        self.round_trips += 1
+        return self._delete(*keys)
+
+    def expire(self, key: str, seconds: float) -> bool:
+        self.round_trips += 1
+        return self._expire(key, seconds)
+
+    def scan_iter(self, match: str = "*", count: Optional[int] = None) -> Iterator[str]:
+        self.round_trips += 1
+        now = time.monotonic()
+        for key in list(self._data):
+            if fnmatch.fnmatchcase(key, match) and not self._expired(key, now):
+                yield key
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        return InMemoryPipeline(self)
+
+    def flushall(self) -> None:
+        self._data.clear()
+
+    # -----------------------------
+    # Internal Logic
+    # -----------------------------
+
+    def _expired(self, key: str, now: float) -> bool:
+        expires_at = self._data[key][1]
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return True
+        return False
+
+    def _get(self, key: str) -> Optional[bytes]:
+        if key not in self._data or self._expired(key, time.monotonic()):
+            return None
+        return self._data[key][0]
+
+    def _set(self, key: str, value: Any, ex: Optional[float] = None) -> bool:
+        if isinstance(value, str):
+            value = value.encode()
+        expires_at = time.monotonic() + ex if ex else None
+        self._data[key] = (bytes(value), expires_at)
+        return True
+
+    def _delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def _expire(self, key: str, seconds: float) -> bool:
+        if self._get(key) is None:
+            return False
+        self._data[key] = (self._data[key][0], time.monotonic() + seconds)
+        return True
+
+
+class InMemoryPipeline:
+    """Buffers commands and runs them in a single round trip on execute()."""
+
+    def __init__(self, client: InMemoryRedis):
+        self._client = client
+        self._commands: List[Tuple[str, tuple, dict]] = []
+
+    def __enter__(self) -> "InMemoryPipeline":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._commands.clear()
+
+    def _queue(self, name: str, *args: Any, **kwargs: Any) -> "InMemoryPipeline":
+        self._commands.append((name, args, kwargs))
+        return self
+
+    def get(self, key: str) -> "InMemoryPipeline":
+        return self._queue("_get", key)
+
+    def set(self, key: str, value: Any, ex: Optional[float] = None) -> "InMemoryPipeline":
+        return self._queue("_set", key, value, ex)
+
+    def mget(self, keys: Sequence[str]) -> "InMemoryPipeline":
+        return self._queue("_mget", keys)
+
+    def delete(self, *keys: str) -> "InMemoryPipeline":
+        return self._queue("_delete", *keys)
+
+    def expire(self, key: str, seconds: float) -> "InMemoryPipeline":
+        return self._queue("_expire", key, seconds)
+
+    def execute(self) -> List[Any]:
+        self._client.round_trips += 1
+        client = self._client
+        results = []
+        for name, args, kwargs in self._commands:
+            if name == "_mget":
+                results.append([client._get(key) for key in args[0]])
+            else:
+                results.append(getattr(client, name)(*args, **kwargs))
+        self._commands.clear()
+        return results
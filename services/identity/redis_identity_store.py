@@ -0,0 +1,152 @@
+# services/identity/redis_identity_store.py
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.identity.iembedding_store import IEmbeddingStore
+
+try:
+    import redis
+except ImportError:  # optional dependency; pass client= to use another backend
+    redis = None
+
+
+class RedisIdentityStore(IEmbeddingStore):
+    """
+    Global identity storage on Redis with pooled connections and pipelining.
+
+    Two kinds of keys are kept, both with a TTL so identities that are no
+    longer observed expire on their own:
+    - {prefix}emb:{global_id}: float32 embedding bytes
+    - {prefix}track:{track_key}: global id assigned to a local track
+
+    Multi-identity reads and writes go through one pipeline each, so a
+    frame's writes cost one round trip regardless of the number of tracks.
+    Pass client= (e.g. InMemoryRedis) to run without a Redis server.
+    """
+
+    def __init__(
+            self,
+            url: str = "redis://localhost:6379/0",
+            key_prefix: str = "navirox:identity:",
+            ttl_seconds: Optional[int] = 24 * 3600,
+            max_connections: int = 16,
+            client: Any = None,
+    ):
+        """
+        Initialize Redis identity store.
+
+        Args:
+            url: Redis connection URL (ignored when client is given)
+            key_prefix: Prefix of every key written by this store
+            ttl_seconds: Expiry of embeddings and track assignments in whole seconds
+                (None disables; redis-py only accepts integer expiries)
+            max_connections: Size of the connection pool
+            client: Pre-built redis-py compatible client
+        """
+        if client is None:
+            if redis is None:
+                raise ImportError("RedisIdentityStore requires the 'redis' package (pip install redis)")
+            pool = redis.ConnectionPool.from_url(url, max_connections=max_connections)
+            client = redis.Redis(connection_pool=pool)
+
+        self._client = client
+        self.key_prefix = key_prefix
+        self.ttl_seconds = None if ttl_seconds is None else max(1, int(ttl_seconds))
+
+    # -----------------------------
+    # Keys
+    # -----------------------------
+
+    def _embedding_key(self, global_id: str) -> str:
+        return f"{self.key_prefix}emb:{global_id}"
+
+    def _track_key(self, track_key: str) -> str:
+        return f"{self.key_prefix}track:{track_key}"
+
+    @staticmethod
+    def _decode(value: Any) -> str:
+        return value.decode() if isinstance(value, bytes) else str(value)
+
+    # -----------------------------
+    # Embeddings (IEmbeddingStore)
+    # -----------------------------
+
+    def save_many(self, global_ids: Sequence[str], embeddings: np.ndarray) -> None:
+        """Write embeddings of many identities in one round trip."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._client.pipeline(transaction=False) as pipe:
+            for global_id, embedding in zip(global_ids, embeddings):
+                pipe.set(self._embedding_key(global_id), embedding.tobytes(), ex=self.ttl_seconds)
+            pipe.execute()
+
+    def delete(self, global_id: str) -> None:
+        self._client.delete(self._embedding_key(global_id))
+
+    def load_embeddings(self, global_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Read embeddings of many identities in one round trip; missing ids are skipped."""
+        if not global_ids:
+            return {}
+        values = self._client.mget([self._embedding_key(global_id) for global_id in global_ids])
+        return {
+            str(global_id): np.frombuffer(value, dtype=np.float32).copy()
+            for global_id, value in zip(global_ids, values)
+            if value is not None
+        }
+
+    def load_all(self) -> Tuple[List[str], np.ndarray]:
+        """Read every stored identity (key scan, then one MGET)."""
+        prefix = self._embedding_key("")
+        keys = [self._decode(key) for key in self._client.scan_iter(match=f"{prefix}*", count=1000)]
+        embeddings = self.load_embeddings([key[len(prefix):] for key in keys])
+        if not embeddings:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        global_ids = list(embeddings)
+        return global_ids, np.stack([embeddings[global_id] for global_id in global_ids])
+
+    # -----------------------------
+    # Track assignments
+    # -----------------------------
+
+    def save_assignments(self, assignments: Mapping[str, str]) -> None:
+        """
+        Write a frame's track -> global id assignments in one round trip.
+        Also refreshes the TTL of the assigned identities' embeddings.
+
+        Args:
+            assignments: {track_key: global_id}
+        """
+        if not assignments:
+            return
+        with self._client.pipeline(transaction=False) as pipe:
+            for track_key, global_id in assignments.items():
+                pipe.set(self._track_key(track_key), str(global_id), ex=self.ttl_seconds)
+            if self.ttl_seconds:
+                for global_id in set(assignments.values()):
+                    pipe.expire(self._embedding_key(global_id), self.ttl_seconds)
+            pipe.execute()
+
+    def load_assignments(self, track_keys: Sequence[str]) -> Dict[str, str]:
+        """
+        Read the global ids of many tracks in one round trip.
+
+        Returns:
+            {track_key: global_id} for tracks with a stored assignment
+        """
+        if not track_keys:
+            return {}
+        values = self._client.mget([self._track_key(track_key) for track_key in track_keys])
+        return {
+            track_key: self._decode(value)
+            for track_key, value in zip(track_keys, values)
+            if value is not None
+        }
+
+    def touch(self, global_ids: Iterable[str]) -> None:
+        """Refresh the TTL of identities that are still being observed."""
+        if not self.ttl_seconds:
+            return
+        with self._client.pipeline(transaction=False) as pipe:
+            for global_id in set(global_ids):
+                pipe.expire(self._embedding_key(global_id), self.ttl_seconds)
+            pipe.execute()
@@ -0,0 +1,302 @@
+# services/identity/vector_index.py
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.identity.iembedding_store import IEmbeddingStore
+
+
+class VectorIndex:
+    """
+    In-process cosine-similarity index over global identity embeddings.
+
+    Embeddings are L2-normalised rows of one contiguous float32 matrix, so
+    a batch of queries is a single matrix multiply. With n_lists > 0 the
+    index can be partitioned into an IVF (inverted file): rows are grouped
+    by their nearest k-means centroid and each query only scores the rows
+    of its n_probe closest lists.
+
+    An optional IEmbeddingStore (e.g. Redis) is used for persistence:
+    writes go through to the store and warm_load() fills the index from it.
+    Lookups never touch the store.
+    """
+
+    def __init__(
+            self,
+            dim: int,
+            store: Optional[IEmbeddingStore] = None,
+            n_lists: int = 0,
+            n_probe: int = 4,
+            initial_capacity: int = 1024,
+    ):
+        """
+        Initialize vector index.
+
+        Args:
+            dim: Embedding dimension
+            store: Optional persistence store for write-through and warm loading
+            n_lists: Number of IVF lists (0 keeps a flat index)
+            n_probe: Lists scanned per query when IVF is trained
+            initial_capacity: Initial number of rows; grows by doubling
+        """
+        self.dim = dim
+        self.store = store
+        self.n_lists = n_lists
+        self.n_probe = max(1, n_probe)
+
+        self._vectors = np.zeros((max(1, initial_capacity), dim), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+        # IVF state: centroids (L x D) and the list of each row
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(len(self._vectors), dtype=np.int64)
+        # Rows sorted by list, with list start offsets; rebuilt lazily after writes
+        self._list_order: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, global_id: str) -> bool:
+        return str(global_id) in self._rows
+
+    @property
+    def is_trained(self) -> bool:
+        """True when IVF partitioning is active."""
+        return self._centroids is not None
+
+    def _normalize(self, embeddings: Any) -> np.ndarray:
+        """Return embeddings as an N x D float32 array of unit rows."""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def _ensure_capacity(self, size: int) -> None:
+        """Grow the row buffers (by doubling) to hold at least size rows."""
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = vectors
+
+        assignments = np.zeros(capacity, dtype=np.int64)
+        assignments[:self._size] = self._assignments[:self._size]
+        self._assignments = assignments
+
+    def add(self, global_ids: Sequence[str], embeddings: Any, persist: bool = True) -> None:
+        """
+        Insert or overwrite identities.
+
+        Args:
+            global_ids: N identity ids
+            embeddings: N x D embeddings (normalised internally)
+            persist: Write through to the store
+        """
+        global_ids = [str(global_id) for global_id in global_ids]
+        if not global_ids:
+            return
+        vectors = self._normalize(embeddings)
+
+        self._ensure_capacity(self._size + len(global_ids))
+        rows = np.empty(len(global_ids), dtype=np.int64)
+        for i, global_id in enumerate(global_ids):
+            row = self._rows.get(global_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._rows[global_id] = row
+                self._ids.append(global_id)
+            rows[i] = row
+
+        self._vectors[rows] = vectors
+        if self.is_trained:
+            self._assignments[rows] = self._nearest_lists(vectors, 1)[:, 0]
+        self._list_order = None
+
+        if persist and self.store is not None:
+            self.store.save_many(global_ids, vectors)
+
+    def remove(self, global_id: str, persist: bool = True) -> None:
+        """
+        Remove an identity by moving the last row into its slot.
+
+        Args:
+            global_id: Identity id
+            persist: Delete from the store as well
+        """
+        global_id = str(global_id)
+        row = self._rows.pop(global_id, None)
+        if row is not None:
+            last = self._size - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._vectors[row] = self._vectors[last]
+                self._assignments[row] = self._assignments[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids.pop()
+            self._size -= 1
+            self._list_order = None
+
+        if persist and self.store is not None:
+            self.store.delete(global_id)
+
+    def warm_load(self) -> int:
+        """
+        Replace the index contents with all identities from the store.
+        Trains IVF partitioning when enabled and enough rows are loaded.
+
+        Returns:
+            Number of identities loaded
+        """
+        self._size = 0
+        self._ids = []
+        self._rows = {}
+        self._centroids = None
+        if self.store is None:
+            return 0
+
+        global_ids, embeddings = self.store.load_all()
+        self.add(global_ids, embeddings, persist=False)
+        if self.n_lists and self._size >= self.n_lists:
+            self.train()
+
+        print(f"[VectorIndex] Warm-loaded {self._size} identities")
+        return self._size
+
+    def train(self, n_iter: int = 10, seed: int = 0) -> None:
+        """
+        Partition current rows into n_lists IVF lists with spherical k-means.
+
+        Args:
+            n_iter: k-means iterations
+            seed: Random seed for centroid initialisation
+        """
+        if not self.n_lists or self._size < self.n_lists:
+            raise ValueError(
+                f"IVF training needs n_lists > 0 and at least n_lists rows "
+                f"(n_lists={self.n_lists}, rows={self._size})"
+            )
+
+        vectors = self._vectors[:self._size]
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(self._size, self.n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            counts = np.bincount(assignments, minlength=self.n_lists)
+            # Empty lists keep their previous centroid
+            non_empty = counts > 0
+            centroids[non_empty] = self._normalize(sums[non_empty])
+
+        self._centroids = centroids
+        self._assignments[:self._size] = np.argmax(vectors @ centroids.T, axis=1)
+        self._list_order = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows grouped by IVF list and the start offset of each list (L + 1)."""
+        if self._list_order is None:
+            assignments = self._assignments[:self._size]
+            self._list_order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=len(self._centroids))
+            self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._list_order, self._list_offsets
+
+    def _nearest_lists(self, queries: np.ndarray, n: int) -> np.ndarray:
+        """Indices of the n closest IVF lists for each query (Q x n)."""
+        scores = queries @ self._centroids.T
+        n = min(n, len(self._centroids))
+        return np.argpartition(-scores, n - 1, axis=1)[:, :n]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Column indices and values of the k best scores per row, best first."""
+        k = min(k, scores.shape[1])
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(scores, idx, axis=1)
+        order = np.argsort(-top, axis=1)
+        return np.take_along_axis(idx, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+    def search(self, queries: Any, k: int = 1) -> Tuple[List[List[str]], np.ndarray]:
+        """
+        Batched top-k cosine-similarity search.
+
+        Args:
+            queries: Q x D query embeddings (or a single D embedding)
+            k: Number of neighbours per query
+
+        Returns:
+            (Q lists of up to k ids, Q x k similarities padded with -inf)
+        """
+        queries = self._normalize(queries)
+        n_queries = len(queries)
+        ids: List[List[str]] = [[] for _ in range(n_queries)]
+        scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        if self._size == 0 or n_queries == 0:
+            return ids, scores
+
+        vectors = self._vectors[:self._size]
+        if not self.is_trained:
+            rows, top = self._top_k(queries @ vectors.T, k)
+            for q in range(n_queries):
+                ids[q] = [self._ids[row] for row in rows[q]]
+                scores[q, :top.shape[1]] = top[q]
+            return ids, scores
+
+        # IVF: group (query, probed list) pairs by list, so each probed list is
+        # scored against all queries probing it in one matrix multiply
+        probes = self._nearest_lists(queries, self.n_probe)
+        n_probe = probes.shape[1]
+        order, offsets = self._inverted_lists()
+
+        candidate_rows = np.zeros((n_queries, n_probe, k), dtype=np.int64)
+        candidate_scores = np.full((n_queries, n_probe, k), -np.inf, dtype=np.float32)
+        pair_lists = probes.ravel()
+        pair_order = np.argsort(pair_lists, kind="stable")
+        pair_offsets = np.concatenate([[0], np.cumsum(np.bincount(pair_lists, minlength=len(self._centroids)))])
+        for l in np.unique(pair_lists).tolist():
+            members = order[offsets[l]:offsets[l + 1]]
+            if len(members) == 0:
+                continue
+            pairs = pair_order[pair_offsets[l]:pair_offsets[l + 1]]
+            q_idx, slot_idx = np.divmod(pairs, n_probe)
+            rows, top = self._top_k(queries[q_idx] @ vectors[members].T, k)
+            candidate_rows[q_idx, slot_idx, :top.shape[1]] = members[rows]
+            candidate_scores[q_idx, slot_idx, :top.shape[1]] = top
+
+        # Merge the per-list candidates of each query
+        best, top = self._top_k(candidate_scores.reshape(n_queries, -1), k)
+        best_rows = np.take_along_axis(candidate_rows.reshape(n_queries, -1), best, axis=1)
+        scores[:, :top.shape[1]] = top
+        for q, (row_list, score_list) in enumerate(zip(best_rows.tolist(), top.tolist())):
+            ids[q] = [self._ids[row] for row, score in zip(row_list, score_list) if score > -np.inf]
+        return ids, scores
+
+    async def similarity(self, embedding: Any, redis_client: Any = None) -> Tuple[Optional[str], float]:
+        """
+        TrackerManager similarity_service: best (global_id, similarity).
+        redis_client is accepted for signature compatibility and unused.
+        """
+        return (await self.batch_similarity([embedding], redis_client))[0]
+
+    async def batch_similarity(
+            self, embeddings: Sequence[Any], redis_client: Any = None
+    ) -> List[Tuple[Optional[str], float]]:
+        """
+        TrackerManager batch_similarity_service: best (global_id, similarity) per embedding.
+        """
+        if len(embeddings) == 0:
+            return []
+        ids, scores = self.search(np.stack([np.asarray(e, dtype=np.float32).reshape(-1) for e in embeddings]), k=1)
+        return [
+            (row_ids[0], float(score[0])) if row_ids else (None, 0.0)
+            for row_ids, score in zip(ids, scores)
+        ]
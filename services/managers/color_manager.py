@@ -1,26 +1,90 @@
 import random
-import hashlib
-from typing import Dict, Tuple, Optional
+import zlib
+from collections import OrderedDict
+from typing import Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
 
 class ColorManager:
-    def __init__(self):
-        self._tracked_colors: Dict[str, Tuple[int, int, int]] = {}
+    # Knuth multiplicative hash: spreads consecutive track ids over the palette
+    _HASH_MULTIPLIER = 2654435761
+
+    def __init__(self, max_tracked_colors: int = 4096):
+        """
+        Args:
+            max_tracked_colors: Size of the LRU cache of per-track colors
+        """
         from constants.color import COLORS
-        self._color_palette =COLORS
+        self._color_palette = COLORS
+        self._palette = np.asarray(COLORS, dtype=np.int64)
+        self._max_tracked_colors = max(1, max_tracked_colors)
+        self._tracked_colors: "OrderedDict[Hashable, Tuple[int, int, int]]" = OrderedDict()
+
+    def _palette_index(self, track_id: Hashable) -> int:
+        """Deterministic palette index of a track id (integers and digit strings hash alike)."""
+        if isinstance(track_id, (int, np.integer)) or (isinstance(track_id, str) and track_id.isdigit()):
+            value = int(track_id)
+        else:
+            value = zlib.crc32(str(track_id).encode())
+        return ((value * self._HASH_MULTIPLIER) & 0xFFFFFFFF) % len(self._color_palette)
 
     def get_color(self, track_id: Optional[str] = None, class_id: Optional[int] = None) -> Tuple[int, int, int]:
         """Get a color for the object. Uses track_id for consistent colors if tracking, else random."""
         if track_id is not None:
-            # Use deterministic color for tracked objects
-            if track_id not in self._tracked_colors:
-                # Generate a color based on track_id (deterministic)
-                color_index = int(hashlib.md5(str(track_id).encode()).hexdigest(), 16) % len(self._color_palette)
-                self._tracked_colors[track_id] = self._color_palette[color_index]
-            return self._tracked_colors[track_id]
+            # Use deterministic color for tracked objects, cached in a bounded LRU
+            color = self._tracked_colors.get(track_id)
+            if color is None:
+                color = self._color_palette[self._palette_index(track_id)]
+                self._tracked_colors[track_id] = color
+                if len(self._tracked_colors) > self._max_tracked_colors:
+                    self._tracked_colors.popitem(last=False)
+            else:
+                self._tracked_colors.move_to_end(track_id)
+            return color
         else:
             # Use random color for non-tracked objects
             return random.choice(self._color_palette) if class_id is None else self._color_palette[class_id % len(self._color_palette)]
 
+    def get_colors(
+            self,
+            track_ids: Sequence[Optional[Hashable]],
+            class_ids: Optional[Sequence[Optional[int]]] = None,
+    ) -> np.ndarray:
+        """
+        Colors for a whole frame in one call, consistent with get_color.
+
+        Args:
+            track_ids: N track ids (None for untracked objects)
+            class_ids: Optional N class ids used for untracked objects
+
+        Returns:
+            N x 3 int array of colors; use tuple(map(int, row)) for OpenCV
+        """
+        n = len(track_ids)
+        if n == 0:
+            return np.zeros((0, 3), dtype=np.int64)
+        palette_size = len(self._color_palette)
+
+        ids = np.asarray(track_ids)
+        if ids.dtype.kind == "U" and np.char.isdigit(ids).all():
+            # Renderers key colors by str(track_id); hash digit strings as integers
+            ids = ids.astype(np.int64)
+        if np.issubdtype(ids.dtype, np.integer):
+            # Fast path: integer track ids are hashed in one vectorised step
+            hashed = (ids.astype(np.uint64) * np.uint64(self._HASH_MULTIPLIER)) & np.uint64(0xFFFFFFFF)
+            return self._palette[(hashed % np.uint64(palette_size)).astype(np.int64)]
+
+        indices = np.empty(n, dtype=np.int64)
+        for i, track_id in enumerate(track_ids):
+            if track_id is not None:
+                indices[i] = self._palette_index(track_id)
+            elif class_ids is not None and class_ids[i] is not None:
+                indices[i] = class_ids[i] % palette_size
+            else:
+                indices[i] = random.randrange(palette_size)
+        return self._palette[indices]
+
     def clear_tracked_colors(self):
         """Clear stored colors for tracked objects (e.g., when processing a new video)."""
-        self._tracked_colors.clear()
\ No newline at end of file
+        self._tracked_colors.clear()
@@ -1,3 +1,6 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+from services.visualization.composite_annotation_renderer import CompositeAnnotationRenderer
 from services.visualization.direction_annotation_renderer import DirectionAnnotationRenderer
 from services.visualization.iannotation_renderer import IAnnotationRenderer
 from services.loaders.idata_loader import IDataLoader
@@ -9,16 +12,68 @@ from services.visualization.detection_annotation_renderer import (
 
 
 class ModelStrategyFactory:
+    """
+    Resolves data loaders and annotation renderers per model_id.
+    Renderers are looked up in a registry and cached, so repeated calls
+    (e.g. once per frame) return the same instance.
+    """
+
+    _DEFAULT_RENDERERS: Tuple[type, ...] = (DetectionAnnotationRenderer,)
+
+    # model_id -> renderer classes, applied in order
+    _renderers: Dict[str, Tuple[type, ...]] = {
+        "navirox_obb.pt": (DetectionAnnotationRenderer, DirectionAnnotationRenderer),
+    }
+
+    _renderer_cache: Dict[Tuple[str, Optional[str]], IAnnotationRenderer] = {}
+    _renderer_instances: Dict[type, IAnnotationRenderer] = {}
+
     @staticmethod
     def get_data_loader(model_id: str, **kwargs) -> IDataLoader:
 
         return DetectionDataLoader()
 
-    @staticmethod
+    @classmethod
     def get_annotation_renderer(
-        model_id: str, kpi_name: str | None = None
+        cls, model_id: str, kpi_name: str | None = None
     ) -> IAnnotationRenderer:
-        if model_id == "navirox_obb.pt":
-            return DirectionAnnotationRenderer()
+        """
+        Return the (cached) renderer for a model.
+
+        Models registered with several renderer classes get a
+        CompositeAnnotationRenderer that runs them in one render_frame() call.
+        """
+        key = (model_id, kpi_name)
+        renderer = cls._renderer_cache.get(key)
+        if renderer is not None:
+            return renderer
+
+        renderer_classes = cls._renderers.get(model_id, cls._DEFAULT_RENDERERS)
+        renderers = [cls._renderer_instance(renderer_class) for renderer_class in renderer_classes]
+        renderer = renderers[0] if len(renderers) == 1 else CompositeAnnotationRenderer(renderers)
+
+        cls._renderer_cache[key] = renderer
+        return renderer
+
+    @classmethod
+    def register_renderers(cls, model_id: str, renderer_classes: Sequence[type]) -> None:
+        """
+        Register the renderer classes used for a model_id.
+
+        Args:
+            model_id: Model identifier
+            renderer_classes: Classes implementing IAnnotationRenderer, applied in order
+        """
+        if not renderer_classes:
+            raise ValueError(f"No renderer classes given for model '{model_id}'")
+        cls._renderers[model_id] = tuple(renderer_classes)
+        for key in [key for key in cls._renderer_cache if key[0] == model_id]:
+            del cls._renderer_cache[key]
 
-        return DetectionAnnotationRenderer()
+    @classmethod
+    def _renderer_instance(cls, renderer_class: type) -> IAnnotationRenderer:
+        """Renderers are stateless, so one instance per class is shared."""
+        renderer = cls._renderer_instances.get(renderer_class)
+        if renderer is None:
+            renderer = cls._renderer_instances[renderer_class] = renderer_class()
+        return renderer
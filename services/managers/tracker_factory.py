@@ -6,6 +6,7 @@ from services.trackers.yolo_trackers import (
     BoTSORTTracker,
     CustomTracker
 )
+from services.trackers.numpy_byte_tracker import NumpyByteTracker
 
 
 
@@ -21,6 +22,8 @@ class TrackerFactory:
         "botsort": BoTSORTTracker,
         "bot": BoTSORTTracker,  # Alias
         "custom": CustomTracker,
+        "numpy_bytetrack": NumpyByteTracker,
+        "numpy_byte": NumpyByteTracker,  # Alias
     }
 
     @classmethod
@@ -33,8 +36,8 @@ class TrackerFactory:
         Create a tracker instance by name.
 
         Args:
-            tracker_name: Name of the tracker ("bytetrack", "botsort", "deepsort", "custom")
-            tracker_config: Optional configuration dictionary for custom trackers
+            tracker_name: Name of the tracker ("bytetrack", "botsort", "numpy_bytetrack", "custom")
+            tracker_config: Optional configuration dictionary for custom and NumPy trackers
 
         Returns:
             Tracker instance implementing ITracker
@@ -57,8 +60,9 @@ class TrackerFactory:
 
         tracker_class = cls._trackers[tracker_name_lower]
 
-        # CustomTracker accepts config, others don't
-        if tracker_name_lower == "global_base" or tracker_name_lower == "custom":
+        # CustomTracker and NumpyByteTracker accept config, others don't
+        if tracker_name_lower == "global_base" or tracker_name_lower == "custom" \
+                or tracker_class is NumpyByteTracker:
             return tracker_class(tracker_config=tracker_config)
         else:
             return tracker_class()
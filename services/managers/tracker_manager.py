@@ -1,11 +1,19 @@
 # tracker_manager.py
 
+import asyncio
+import heapq
+import itertools
 import time
-from typing import Dict, Optional, Any, Tuple
+from typing import Dict, Optional, Any, Tuple, List, Iterable, Mapping, Union
+
+import numpy as np
+
+from services.identity.crop_quality import crop_quality, appearance_signature, appearance_drift
 
 class TrackerState:
     """
     Holds identity resolution state for a single local track_id
+    Timestamps use time.monotonic()
     """
     __slots__ = (
         "track_id",
@@ -14,10 +22,14 @@ class TrackerState:
         "last_seen_ts",
         "last_verified_ts",
         "verification_attempts",
+        "embedding",
+        "embedding_quality",
+        "appearance",
     )
 
-    def __init__(self, track_id: str):
-        now = time.time()
+    def __init__(self, track_id: str, now: Optional[float] = None):
+        if now is None:
+            now = time.monotonic()
         self.track_id = track_id
         self.global_id: Optional[str] = None
         self.first_seen_ts = now
@@ -25,6 +37,11 @@ class TrackerState:
         self.last_verified_ts: float = 0.0
         self.verification_attempts: int = 0
 
+        # Embedding cache: last embedding, its crop quality and appearance signature
+        self.embedding: Any = None
+        self.embedding_quality: float = 0.0
+        self.appearance: Optional[np.ndarray] = None
+
 
 class TrackerManager:
     """
@@ -45,13 +62,25 @@ class TrackerManager:
         verification_interval: float = 3.0,
         similarity_threshold: float = 0.80,
         track_timeout: float = 10.0,
-        unknown_label: str = "Unknown"
+        unknown_label: str = "Unknown",
+        stream_id: Optional[str] = None,
+        batch_embedding_service=None,
+        batch_similarity_service=None,
+        background_verification: bool = True,
+        max_concurrent_verifications: int = 4,
+        embedding_cache: bool = True,
+        embedding_quality_margin: float = 0.1,
+        appearance_drift_threshold: float = 0.4,
+        quality_fn=crop_quality,
+        appearance_fn=appearance_signature
     ):
         """
         Parameters
         ----------
         redis_client:
-            Instance of RedisClient (your wrapper)
+            Instance of RedisClient (your wrapper). If it provides
+            save_assignments({track_id: global_id}) (e.g. RedisIdentityStore),
+            resolved identities are written back once per verification batch
 
         embedding_service:
             ASYNC function:
@@ -72,18 +101,86 @@ class TrackerManager:
 
         unknown_label:
             Label used when no global identity is found
+
+        stream_id:
+            Stream (camera) this manager serves. Local track ids are only
+            unique per stream, so persisted assignments are keyed as
+            "{stream_id}:{track_id}" when set
+
+        batch_embedding_service:
+            Optional ASYNC function used by update_many:
+                embeddings = await batch_embedding_service(person_data_list, track_ids)
+            Falls back to concurrent embedding_service calls
+
+        batch_similarity_service:
+            Optional ASYNC function used by update_many:
+                [(global_id, similarity), ...] = await batch_similarity_service(embeddings, redis_client)
+            Falls back to concurrent similarity_service calls
+
+        background_verification:
+            Run verification as background tasks so update() / update_many()
+            return the current global_id immediately; results are applied
+            when they arrive. False awaits verification inline
+
+        max_concurrent_verifications:
+            Maximum number of verification tasks running at once; further
+            tasks wait in a queue
+
+        embedding_cache:
+            Keep the last embedding per track and reuse it for periodic
+            re-verification unless a better crop appears or the appearance drifts
+
+        embedding_quality_margin:
+            Crop quality gain (0..1 scale) over the cached crop that triggers re-embedding
+
+        appearance_drift_threshold:
+            Appearance-signature distance (0..1) from the cached crop that triggers re-embedding
+
+        quality_fn:
+            quality = quality_fn(person_data), in [0, 1] (None when unknown)
+
+        appearance_fn:
+            signature = appearance_fn(person_data), compared with appearance_drift()
+            (None when unknown)
         """
         self._redis = redis_client
         self._embedder = embedding_service
         self._similarity = similarity_service
+        self._batch_embedder = batch_embedding_service
+        self._batch_similarity = batch_similarity_service
 
         self._verification_interval = verification_interval
         self._similarity_threshold = similarity_threshold
         self._track_timeout = track_timeout
         self._unknown_label = unknown_label
+        self._stream_id = stream_id
 
         self._tracks: Dict[str, TrackerState] = {}
 
+        # Expiry min-heap of (deadline, seq, state), one entry per track.
+        # Entries are refreshed lazily when they reach the top of the heap.
+        self._expiry_heap: List[Tuple[float, int, TrackerState]] = []
+        self._expiry_seq = itertools.count()
+
+        # Background verification: one task per track (batches share a task)
+        self._background = background_verification
+        self._max_concurrent = max(1, max_concurrent_verifications)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._queued_count = 0
+        self._running_count = 0
+        self._completed_count = 0
+        self._failed_count = 0
+        self._dropped_count = 0
+
+        self._embedding_cache = embedding_cache
+        self._quality_margin = embedding_quality_margin
+        self._drift_threshold = appearance_drift_threshold
+        self._quality_fn = quality_fn
+        self._appearance_fn = appearance_fn
+        self._embeddings_computed = 0
+        self._embeddings_reused = 0
+
     # -----------------------------
     # Public API
     # -----------------------------
@@ -96,26 +193,75 @@ class TrackerManager:
         """
         Main entry point called once per detection per frame
 
+        With background verification the current global_id is returned
+        immediately and the verification result is applied when it arrives.
+
         Returns
         -------
         (track_id, global_id)
         """
 
-        now = time.time()
+        now = time.monotonic()
         self._cleanup_expired_tracks(now)
 
-        if track_id not in self._tracks:
-            self._tracks[track_id] = TrackerState(track_id)
-
-        state = self._tracks[track_id]
-        state.last_seen_ts = now
+        state = self._touch(track_id, now)
 
         # Decide if we should attempt verification
-        if self._should_verify(state, now):
-            await self._attempt_verification(state, person_data)
+        if self._should_verify(state, now) and track_id not in self._inflight:
+            if self._background:
+                self._schedule([state], self._attempt_verification(state, person_data))
+            else:
+                await self._attempt_verification(state, person_data)
 
         return state.track_id, state.global_id or self._unknown_label
 
+    async def update_many(
+        self,
+        frame_tracks: Union[Mapping[str, Any], Iterable[Tuple[str, Any]]]
+    ) -> List[Tuple[str, str]]:
+        """
+        Frame-level entry point: update every track of a frame at once
+
+        All tracks due for verification share one batched embedding call
+        and one batched similarity query.
+
+        Parameters
+        ----------
+        frame_tracks:
+            {track_id: person_data} or iterable of (track_id, person_data)
+
+        Returns
+        -------
+        [(track_id, global_id), ...] in input order
+        """
+        if isinstance(frame_tracks, Mapping):
+            frame_tracks = frame_tracks.items()
+
+        now = time.monotonic()
+        self._cleanup_expired_tracks(now)
+
+        states: List[TrackerState] = []
+        due_states: List[TrackerState] = []
+        due_data: List[Any] = []
+        for track_id, person_data in frame_tracks:
+            state = self._touch(track_id, now)
+            states.append(state)
+            if (
+                self._should_verify(state, now)
+                and state.track_id not in self._inflight
+                and state not in due_states
+            ):
+                due_states.append(state)
+                due_data.append(person_data)
+
+        if due_states:
+            if self._background:
+                self._schedule(due_states, self._attempt_batch_verification(due_states, due_data))
+            else:
+                await self._attempt_batch_verification(due_states, due_data)
+
+        return [(state.track_id, state.global_id or self._unknown_label) for state in states]
+
     def format_label(self, track_id: str) -> str:
         """
         Returns formatted label:
@@ -129,16 +275,122 @@ class TrackerManager:
         gid = state.global_id or self._unknown_label
         return f"Person_T{track_id}_G{gid}"
 
+    @property
+    def verification_stats(self) -> Dict[str, int]:
+        """
+        Background verification counters:
+            in_flight - tasks currently running
+            queued    - tasks waiting for a concurrency slot
+            completed - tasks whose results were applied
+            failed    - tasks whose services raised
+            dropped   - tasks cancelled or discarded because their track expired
+            embeddings_computed / embeddings_reused - embedding cache misses / hits
+        """
+        return {
+            "in_flight": self._running_count,
+            "queued": self._queued_count,
+            "completed": self._completed_count,
+            "failed": self._failed_count,
+            "dropped": self._dropped_count,
+            "embeddings_computed": self._embeddings_computed,
+            "embeddings_reused": self._embeddings_reused,
+        }
+
+    async def drain(self):
+        """
+        Wait for all pending background verifications to finish
+        """
+        while self._inflight:
+            await asyncio.gather(*set(self._inflight.values()), return_exceptions=True)
+
     def clear(self):
         """
         Clears all local tracking state
         """
+        for track_id in list(self._inflight):
+            self._cancel_verification(track_id)
         self._tracks.clear()
+        self._expiry_heap.clear()
 
     # -----------------------------
     # Internal Logic
     # -----------------------------
 
+    def _schedule(self, states: List[TrackerState], verification):
+        """
+        Start a verification coroutine as a background task for the given tracks
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent)
+
+        self._queued_count += 1
+        entered: List[bool] = []
+        task = asyncio.ensure_future(self._run_limited(verification, entered))
+        for state in states:
+            self._inflight[state.track_id] = task
+
+        def _done(finished: asyncio.Task):
+            for state in states:
+                if self._inflight.get(state.track_id) is finished:
+                    del self._inflight[state.track_id]
+            if finished.cancelled():
+                self._dropped_count += 1
+                if not entered:
+                    # Cancelled before _run_limited started, so its finally never ran
+                    self._queued_count -= 1
+                    verification.close()
+
+        task.add_done_callback(_done)
+
+    async def _run_limited(self, verification, entered: List[bool]):
+        """
+        Run a verification coroutine under the concurrency limit
+
+        The verification returns True when applied, False when its services
+        failed and None when its result was stale (track expired meanwhile).
+        entered is marked as soon as this coroutine starts running.
+        """
+        entered.append(True)
+        acquired = False
+        try:
+            async with self._semaphore:
+                self._queued_count -= 1
+                self._running_count += 1
+                acquired = True
+                result = await verification
+                if result is None:
+                    self._dropped_count += 1
+                elif result:
+                    self._completed_count += 1
+                else:
+                    self._failed_count += 1
+        finally:
+            if acquired:
+                self._running_count -= 1
+            else:
+                self._queued_count -= 1
+                verification.close()
+
+    def _cancel_verification(self, track_id: str):
+        """
+        Cancel the pending verification of a track
+        (shared batch tasks are cancelled once all of their tracks are gone)
+        """
+        task = self._inflight.pop(track_id, None)
+        if task is not None and task not in self._inflight.values():
+            task.cancel()
+
+    def _touch(self, track_id: str, now: float) -> TrackerState:
+        """
+        Get or create the state of a track and mark it as seen
+        """
+        state = self._tracks.get(track_id)
+        if state is None:
+            state = self._tracks[track_id] = TrackerState(track_id, now)
+            self._push_expiry(state)
+        state.last_seen_ts = now
+        return state
+
     def _should_verify(self, state: TrackerState, now: float) -> bool:
         """
         Time-based gating logic for embedding verification
@@ -150,39 +402,199 @@ class TrackerManager:
         # Periodic re-verification
         return (now - state.last_verified_ts) >= self._verification_interval
 
-    async def _attempt_verification(self, state: TrackerState, person_data: Any):
+    async def _attempt_verification(self, state: TrackerState, person_data: Any) -> Optional[bool]:
         """
         Generate embedding and attempt Redis-based identity resolution
+        Returns False if the services failed, None if the result was stale
         """
         try:
-            embedding = await self._embedder(person_data, state.track_id)
+            embedding = (await self._get_embeddings([state], [person_data], batch=False))[0]
 
             global_id, similarity = await self._similarity(
                 embedding,
                 self._redis
             )
 
-            state.verification_attempts += 1
-            state.last_verified_ts = time.time()
+            if not self._apply_verification(state, global_id, similarity, time.monotonic()):
+                return None
+            await self._persist_assignments([state])
+            return True
+
+        except Exception as e:
+            # Fail-safe: never break pipeline
+            print(f"[TrackerManager] Verification failed for T{state.track_id}: {e}")
+            return False
+
+    async def _attempt_batch_verification(
+        self, states: List[TrackerState], person_data: List[Any]
+    ) -> Optional[bool]:
+        """
+        Generate embeddings and resolve identities for many tracks in one round trip each
+        Returns False if the services failed, None if every result was stale
+        """
+        try:
+            embeddings = await self._get_embeddings(states, person_data, batch=True)
 
-            if global_id and similarity >= self._similarity_threshold:
-                state.global_id = str(global_id)
+            if self._batch_similarity is not None:
+                matches = await self._batch_similarity(list(embeddings), self._redis)
             else:
-                if state.global_id is None:
-                    state.global_id = self._unknown_label
+                matches = await asyncio.gather(*(
+                    self._similarity(embedding, self._redis) for embedding in embeddings
+                ))
+
+            if len(matches) != len(states):
+                raise ValueError(f"expected {len(states)} results, got {len(matches)}")
+
+            now = time.monotonic()
+            applied = [
+                state
+                for state, (global_id, similarity) in zip(states, matches)
+                if self._apply_verification(state, global_id, similarity, now)
+            ]
+            if not applied:
+                return None
+            await self._persist_assignments(applied)
+            return True
 
         except Exception as e:
             # Fail-safe: never break pipeline
-            print(f"[TrackerManager] Verification failed for T{state.track_id}: {e}")
+            print(f"[TrackerManager] Batch verification failed for {len(states)} tracks: {e}")
+            return False
+
+    async def _get_embeddings(self, states: List[TrackerState], person_data: List[Any], batch: bool) -> List[Any]:
+        """
+        Embeddings for the given tracks, reusing cached ones where allowed
+
+        A track is (re-)embedded when it has no cached embedding, when the
+        crop quality beats the cached one by embedding_quality_margin, or when
+        its appearance drifted by more than appearance_drift_threshold.
+        When quality or appearance cannot be measured (e.g. opaque
+        person_data) the cache is not trusted and the track is re-embedded
+        on every verification_interval, as without the cache.
+        Freshly computed embeddings replace the cache of their track.
+        """
+        embeddings: List[Any] = [None] * len(states)
+        pending: List[int] = []
+        observations: Dict[int, Tuple[Optional[float], Optional[np.ndarray]]] = {}
+
+        for i, (state, data) in enumerate(zip(states, person_data)):
+            if not self._embedding_cache:
+                pending.append(i)
+                continue
+
+            quality = self._quality_fn(data)
+            appearance = self._appearance_fn(data)
+            observations[i] = (quality, appearance)
+
+            if (
+                state.embedding is None
+                or quality is None
+                or appearance is None
+                or state.appearance is None
+                or quality >= state.embedding_quality + self._quality_margin
+                or appearance_drift(state.appearance, appearance) > self._drift_threshold
+            ):
+                pending.append(i)
+            else:
+                embeddings[i] = state.embedding
+
+        self._embeddings_reused += len(states) - len(pending)
+        if not pending:
+            return embeddings
+
+        pending_data = [person_data[i] for i in pending]
+        pending_ids = [states[i].track_id for i in pending]
+        if batch and self._batch_embedder is not None:
+            computed = await self._batch_embedder(pending_data, pending_ids)
+        else:
+            computed = await asyncio.gather(*(
+                self._embedder(data, track_id) for data, track_id in zip(pending_data, pending_ids)
+            ))
+        self._embeddings_computed += len(pending)
+
+        for i, embedding in zip(pending, computed):
+            embeddings[i] = embedding
+            if i in observations:
+                state = states[i]
+                quality, appearance = observations[i]
+                state.embedding = embedding
+                state.embedding_quality = 0.0 if quality is None else quality
+                state.appearance = appearance
+
+        return embeddings
+
+    def _assignment_key(self, track_id: str) -> str:
+        """
+        Persisted key of a local track (prefixed with the stream id, if any)
+        """
+        if self._stream_id is None:
+            return str(track_id)
+        return f"{self._stream_id}:{track_id}"
+
+    async def _persist_assignments(self, states: List[TrackerState]):
+        """
+        Write resolved track -> global id assignments in a single call
+
+        The (blocking) store call runs in the default executor so the event
+        loop keeps serving other verifications meanwhile.
+        """
+        save_assignments = getattr(self._redis, "save_assignments", None)
+        if save_assignments is None:
+            return
+
+        assignments = {
+            self._assignment_key(state.track_id): state.global_id
+            for state in states
+            if state.global_id and state.global_id != self._unknown_label
+        }
+        if assignments:
+            await asyncio.get_running_loop().run_in_executor(None, save_assignments, assignments)
+
+    def _apply_verification(self, state: TrackerState, global_id: Any, similarity: float, now: float) -> bool:
+        """
+        Apply one similarity result to a track state
+        Returns False (and leaves the state untouched) for stale results
+        """
+        # Stale result: the track expired (or was recreated) while verifying
+        if self._tracks.get(state.track_id) is not state:
+            return False
+
+        state.verification_attempts += 1
+        state.last_verified_ts = now
+
+        if global_id and similarity >= self._similarity_threshold:
+            state.global_id = str(global_id)
+        else:
+            if state.global_id is None:
+                state.global_id = self._unknown_label
+        return True
+
+    def _push_expiry(self, state: TrackerState):
+        """
+        Schedule the expiry check of a track at its current deadline
+        """
+        deadline = state.last_seen_ts + self._track_timeout
+        heapq.heappush(self._expiry_heap, (deadline, next(self._expiry_seq), state))
 
     def _cleanup_expired_tracks(self, now: float):
         """
         Remove tracks that haven't been seen recently
-        """
-        expired = [
-            tid for tid, state in self._tracks.items()
-            if (now - state.last_seen_ts) > self._track_timeout
-        ]
 
-        for tid in expired:
-            del self._tracks[tid]
+        Only heap entries whose deadline has passed are inspected. A track
+        seen since its entry was pushed is re-pushed with its new deadline,
+        so each update costs amortized O(1) expiry work.
+        """
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now:
+            _, _, state = heapq.heappop(heap)
+            tid = state.track_id
+
+            # Entry of a track that was already removed or recreated
+            if self._tracks.get(tid) is not state:
+                continue
+
+            if (now - state.last_seen_ts) > self._track_timeout:
+                del self._tracks[tid]
+                self._cancel_verification(tid)
+            else:
+                self._push_expiry(state)
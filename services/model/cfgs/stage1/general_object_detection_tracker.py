@@ -1,10 +1,11 @@
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Hashable, List, Optional
 
 import torch
 from ultralytics import YOLO
 
 
+from constants.detections_constant import BBOX, CONFIDENCE, CLASS_ID, CLASS_NAME, MODEL_ID
 from services.managers.tracker_factory import TrackerFactory
 from services.model.cfgs.ibase_stage import BaseStage
 from services.trackers.itracker import ITracker
@@ -14,15 +15,26 @@ class GeneralObjectTrackerStage1(BaseStage):
     """
     Stage 1 - Detect and track objects across frames.
     Uses pluggable tracker implementations (ByteTrack, BoTSORT, DeepSORT, etc.)
+
+    One stage (one set of weights) can serve several cameras: trackers are
+    kept per stream_id and created lazily, while the shared model only
+    supplies detections. This needs a tracker with supports_detections
+    (e.g. the default "numpy_bytetrack"); model-bound trackers such as
+    "bytetrack" and "botsort" keep their state on the model and can only
+    serve a single stream.
     """
+
+    DEFAULT_STREAM_ID = "default"
+
     def __init__(
         self,
         model_path: str,
         model_id: str,
         tag: List[str] | str,
         device: Optional[str] = None,
-        tracker_name: str = "bytetrack",
-    #    tracker_config: Optional[Dict[str, Any]] = None,
+        tracker_name: str = "numpy_bytetrack",
+        tracker_config: Optional[Dict[str, Any]] = None,
+        conf: float = 0.5,
     ):
         super().__init__(model_id)
         if device is None:
@@ -34,24 +46,75 @@ class GeneralObjectTrackerStage1(BaseStage):
         except AttributeError:
             pass
         self.tag = tag
-        
-        # Initialize tracker using factory
-        self.tracker: ITracker = TrackerFactory.create_tracker(tracker_name)
-    
-    def set_tracker(self, tracker_name: str) -> None:
+        self.conf = conf
+
+        # Trackers are created lazily per stream using the factory
+        self.tracker_name = tracker_name
+        self.tracker_config = tracker_config
+        self._trackers: Dict[Hashable, ITracker] = {}
+
+    @property
+    def tracker(self) -> ITracker:
+        """Tracker of the default stream."""
+        return self.get_tracker(self.DEFAULT_STREAM_ID)
+
+    def get_tracker(self, stream_id: Hashable) -> ITracker:
+        """
+        Return the tracker for a stream, creating it on first use.
+
+        Raises:
+            ValueError: If a second stream is requested with a tracker that
+                keeps its state on the shared model
+        """
+        tracker = self._trackers.get(stream_id)
+        if tracker is not None:
+            return tracker
+
+        tracker = TrackerFactory.create_tracker(self.tracker_name, self.tracker_config)
+        if self._trackers and not tracker.supports_detections:
+            raise ValueError(
+                f"Tracker '{self.tracker_name}' keeps its state on the shared model and "
+                f"cannot serve stream '{stream_id}' alongside {list(self._trackers)}. "
+                "Use a detection-based tracker such as 'numpy_bytetrack'."
+            )
+
+        self._trackers[stream_id] = tracker
+        return tracker
+
+    def reset_stream(self, stream_id: Hashable) -> None:
+        """Reset the tracker of a stream, e.g. when its camera reconnects."""
+        tracker = self._trackers.get(stream_id)
+        if tracker is None:
+            return
+        tracker.reset()
+        if not tracker.supports_detections:
+            # Model-bound trackers keep their state on the model's predictor
+            predictor = getattr(self.model, "predictor", None)
+            for model_tracker in getattr(predictor, "trackers", None) or []:
+                model_tracker.reset()
+
+    def remove_stream(self, stream_id: Hashable) -> None:
+        """Drop the tracker of a stream that is no longer served."""
+        self._trackers.pop(stream_id, None)
+
+    def set_tracker(self, tracker_name: str, tracker_config: Optional[Dict[str, Any]] = None) -> None:
         """
         Change the tracker used by this stage.
+        Existing per-stream trackers are dropped and recreated on next use.
         
         Args:
-            tracker_name: Name of tracker ("bytetrack", "botsort", "deepsort", "custom")
-            tracker_config: Optional configuration for custom trackers
+            tracker_name: Name of tracker ("bytetrack", "botsort", "numpy_bytetrack", "custom")
+            tracker_config: Optional configuration for custom and NumPy trackers
         """
-        self.tracker = TrackerFactory.create_tracker(tracker_name)
+        self.tracker_name = tracker_name
+        self.tracker_config = tracker_config
+        self._trackers.clear()
 
     def forward(
         self,
         image,
         prev_results: Optional[List[Dict[str, Any]]] = None,
+        stream_id: Hashable = DEFAULT_STREAM_ID,
     ) -> List[Dict[str, Any]]:
         """
         Track objects across frames using configured tracker.
@@ -60,10 +123,12 @@ class GeneralObjectTrackerStage1(BaseStage):
         1. Normalize tag to list of lowercase class names
         2. Run model predictions to get raw detections
         3. Build class ids list from filtered classes
-        4. Call tracker.track() with class filter
+        4. Associate detections with the stream's tracker
+           (or call tracker.track() with class filter for model-bound trackers)
         5. Return tracked detections filtered by tag
         """
         detections = []
+        tracker = self.get_tracker(stream_id)
         
         # Normalize tag to list of lowercase class names
         if isinstance(self.tag, str):
@@ -72,8 +137,12 @@ class GeneralObjectTrackerStage1(BaseStage):
             tag_list = [t.lower() for t in self.tag]
         
         # Step 1: Run model predictions to get raw detections
+        # Detection-based trackers also need low-score detections for association
+        pred_conf = self.conf
+        if tracker.supports_detections:
+            pred_conf = min(self.conf, getattr(tracker, "low_conf_threshold", self.conf))
         try:
-            pred_results = self.model.predict(image, device=self.device, verbose=False, conf=0.5)
+            pred_results = self.model.predict(image, device=self.device, verbose=False, conf=pred_conf)
         except Exception as e:
             print(f"Prediction failed: {e}")
             return detections
@@ -93,24 +162,60 @@ class GeneralObjectTrackerStage1(BaseStage):
                     classes.append(class_id)
             classes_to_track = classes if classes else None
         
-        # Step 3: Call tracker.track() from tracker instance
+        # Step 3: Associate with the stream's tracker
         try:
-            detections = self.tracker.track(
-                frame=image,
-                model=self.model,
-                device=self.device,
-                persist=True,
-                conf=0.5,
-                model_id=self.model_id,
-                tag=tag_list,
-                classes=classes_to_track,
-            )
+            if tracker.supports_detections:
+                # Low-score detections only help association; like the
+                # model-bound trackers, only tracks at or above conf are returned
+                detections = [
+                    detection
+                    for detection in tracker.track_detections(
+                        self._result_to_detections(pred_result, tag_list),
+                        high_thresh=self.conf,
+                    )
+                    if detection[CONFIDENCE] >= self.conf
+                ]
+            else:
+                detections = tracker.track(
+                    frame=image,
+                    model=self.model,
+                    device=self.device,
+                    persist=True,
+                    conf=self.conf,
+                    model_id=self.model_id,
+                    tag=tag_list,
+                    classes=classes_to_track,
+                )
         except Exception as e:
             print(f"Tracking failed: {e}")
             detections = []
         
         return detections
 
+    def _result_to_detections(self, result, tag_list: List[str]) -> List[Dict[str, Any]]:
+        """Convert a YOLO prediction result to detection dicts filtered by tag."""
+        detections = []
+        if result.boxes is None:
+            return detections
+
+        boxes = result.boxes.xyxy.cpu().numpy()
+        confidences = result.boxes.conf.cpu().numpy()
+        class_ids = result.boxes.cls.cpu().numpy().astype(int)
+
+        for box, confidence, class_id in zip(boxes, confidences, class_ids):
+            cls = str(result.names[int(class_id)]).lower()
+            if cls in tag_list or 'all' in tag_list:
+                detections.append(
+                    {
+                        BBOX: list(map(int, box.tolist())),
+                        CONFIDENCE: float(confidence),
+                        CLASS_ID: int(class_id),
+                        CLASS_NAME: cls,
+                        MODEL_ID: self.model_id,
+                    }
+                )
+        return detections
+
 
     @property
     def names(self) -> Dict[int, str]:
@@ -31,6 +31,7 @@ def _render_with_renderer(
     color_manager: ColorManager,
     regions: List,
 ) -> None:
+    detections_to_render = []
     for detection in detections:
         detection_to_render = dict(detection)
 
@@ -42,7 +43,9 @@ def _render_with_renderer(
         if not isinstance(class_id_value, int):
             detection_to_render[CLASS_ID] = DEFAULT_CLASS_ID
 
-        renderer.render(frame, detection_to_render, regions, color_manager)
+        detections_to_render.append(detection_to_render)
+
+    renderer.render_frame(frame, detections_to_render, regions, color_manager)
 
 
 
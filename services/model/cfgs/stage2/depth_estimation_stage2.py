@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Optional, Sequence
+import zlib
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
@@ -22,6 +23,9 @@ class DepthEstimationStage2(BaseStage):
     DEPTH_DISTANCE = "depth_distance"
     DEPTH_MAP = "depth_map"  # Optional: store full depth map
 
+    # Stride used when sampling pixels for the cheap frame content hash
+    _FRAME_HASH_STRIDE = 16
+
     def __init__(
         self,
         model_path: str,
@@ -88,6 +92,51 @@ class DepthEstimationStage2(BaseStage):
         self.model.to(self.device).eval()
         print(f"[DepthEstimationStage2] Model loaded on {self.device}")
 
+        # Last computed depth map, shared between forward() and visualization
+        self._last_depth_key: Optional[Hashable] = None
+        self._last_depth_map: Optional[np.ndarray] = None
+
+        # Preallocated display-resolution buffers for the colormap conversion
+        self._vis_buffer: Optional[np.ndarray] = None
+        self._colormap_buffer: Optional[np.ndarray] = None
+
+    def _frame_key(self, image: np.ndarray, frame_id: Optional[Hashable] = None) -> Hashable:
+        """
+        Build the cache key for a frame.
+
+        Uses the caller supplied frame identifier when available, otherwise a
+        CRC32 over a strided subsample of the frame plus its shape.
+        """
+        if frame_id is not None:
+            return ("id", frame_id)
+
+        stride = self._FRAME_HASH_STRIDE
+        sample = np.ascontiguousarray(image[::stride, ::stride])
+        return ("crc", image.shape, zlib.crc32(sample.data))
+
+    def _get_depth_map(
+        self, image: np.ndarray, frame_id: Optional[Hashable] = None
+    ) -> np.ndarray:
+        """
+        Return the depth map for a frame, reusing the last result when the
+        frame matches the one most recently inferred.
+        """
+        key = self._frame_key(image, frame_id)
+        if self._last_depth_map is not None and key == self._last_depth_key:
+            return self._last_depth_map
+
+        with torch.inference_mode():
+            depth_map = self.model.infer_image(image)
+
+        self._last_depth_key = key
+        self._last_depth_map = depth_map
+        return depth_map
+
+    def clear_depth_cache(self) -> None:
+        """Drop the cached depth map (e.g. when switching video sources)."""
+        self._last_depth_key = None
+        self._last_depth_map = None
+
     def _clip_bbox(
         self, bbox: Sequence[int | float], width: int, height: int
     ) -> Optional[List[int]]:
@@ -132,7 +181,10 @@ class DepthEstimationStage2(BaseStage):
 
     @torch.inference_mode()
     def forward(
-        self, image: np.ndarray, prev_results: Optional[List[Dict[str, Any]]] = None
+        self,
+        image: np.ndarray,
+        prev_results: Optional[List[Dict[str, Any]]] = None,
+        frame_id: Optional[Hashable] = None,
     ) -> List[Dict[str, Any]]:
         """
         Run depth estimation on image and add depth info to detections.
@@ -140,6 +192,8 @@ class DepthEstimationStage2(BaseStage):
         Args:
             image: Input image (BGR format from OpenCV)
             prev_results: List of detections from previous stage
+            frame_id: Optional frame identifier used to share the depth map
+                with get_depth_visualization(); a content hash is used if omitted
 
         Returns:
             Updated list of detections with depth information added
@@ -149,8 +203,8 @@ class DepthEstimationStage2(BaseStage):
 
         height, width = image.shape[:2]
 
-        # Compute depth map for entire image once
-        depth_map = self.model.infer_image(image)
+        # Compute depth map for entire image once (cached for visualization)
+        depth_map = self._get_depth_map(image, frame_id)
 
         # Process each detection
         for detection in prev_results:
@@ -183,30 +237,49 @@ class DepthEstimationStage2(BaseStage):
         return prev_results
 
     def get_depth_visualization(
-        self, image: np.ndarray, colormap: int = cv2.COLORMAP_PLASMA
+        self,
+        image: np.ndarray,
+        colormap: int = cv2.COLORMAP_PLASMA,
+        frame_id: Optional[Hashable] = None,
+        display_size: Optional[Tuple[int, int]] = None,
     ) -> np.ndarray:
         """
         Generate a colored depth map visualization.
 
+        Reuses the depth map computed by forward() for the same frame, and
+        runs the normalisation and colormap at display resolution.
+
         Args:
             image: Input image
             colormap: OpenCV colormap constant
+            frame_id: Optional frame identifier matching the one given to forward()
+            display_size: Optional (width, height) of the visualization;
+                defaults to the image resolution
 
         Returns:
-            Colored depth map visualization
+            Colored depth map visualization. The returned array is an internal
+            buffer that is overwritten on the next call; copy it to keep it.
         """
-        with torch.inference_mode():
-            depth_map = self.model.infer_image(image)
+        depth_map = self._get_depth_map(image, frame_id)
+
+        if display_size is not None and tuple(display_size) != (depth_map.shape[1], depth_map.shape[0]):
+            depth_map = cv2.resize(depth_map, tuple(display_size), interpolation=cv2.INTER_AREA)
+
+        height, width = depth_map.shape[:2]
+        if self._vis_buffer is None or self._vis_buffer.shape != (height, width):
+            self._vis_buffer = np.empty((height, width), dtype=np.uint8)
+            self._colormap_buffer = np.empty((height, width, 3), dtype=np.uint8)
 
-        # Normalize to 0-255
-        depth_vis = depth_map - depth_map.min()
-        depth_vis /= depth_vis.max() + 1e-6
-        depth_vis = (depth_vis * 255).astype(np.uint8)
+        # Normalize to 0-255 straight into the preallocated uint8 buffer
+        depth_min = float(depth_map.min())
+        depth_max = float(depth_map.max())
+        alpha = 255.0 / (depth_max - depth_min + 1e-6)
+        cv2.convertScaleAbs(depth_map, dst=self._vis_buffer, alpha=alpha, beta=-depth_min * alpha)
 
         # Apply colormap
-        depth_colormap = cv2.applyColorMap(depth_vis, colormap)
+        cv2.applyColorMap(self._vis_buffer, colormap, dst=self._colormap_buffer)
 
-        return depth_colormap
+        return self._colormap_buffer
 
     @property
     def names(self) -> Dict[int, str]:
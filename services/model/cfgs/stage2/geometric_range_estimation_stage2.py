@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import numpy as np
+
+from constants.detections_constant import BBOX, CLASS_NAME, MODEL_ID, OTHER
+from services.model.cfgs.ibase_stage import BaseStage
+
+if TYPE_CHECKING:
+    from services.model.cfgs.stage2.depth_estimation_stage2 import DepthEstimationStage2
+
+
+class GeometricRangeEstimationStage2(BaseStage):
+    """
+    Stage 2 - Zero-inference range estimation for targets on the sea surface.
+
+    Range follows from the camera mounting height and the depression angle of
+    the bbox bottom edge below the horizon line, optionally corrected for the
+    curvature of the earth. Writes the same OTHER["distance"] field as
+    DepthEstimationStage2, so it can replace it when depth inference is shed.
+
+    When a depth stage is attached, the stage runs in calibration mode instead:
+    it leaves the depth stage's distances untouched and updates that stage's
+    depth_scale_factor online from the geometric ranges.
+    """
+
+    DISTANCE = "distance"
+    EARTH_RADIUS_M = 6_371_000.0
+
+    def __init__(
+        self,
+        model_id: str,
+        camera_height_m: float = 4.5,
+        horizon_y: Optional[float] = None,
+        horizon_ratio: float = 0.5,
+        focal_length_px: Optional[float] = None,
+        vertical_fov_deg: float = 50.0,
+        use_earth_curvature: bool = False,
+        max_range_m: float = 5000.0,
+        exclude_classes: Optional[List[str]] = None,
+        depth_stage: Optional["DepthEstimationStage2"] = None,
+        calibration_momentum: float = 0.1,
+    ):
+        """
+        Initialize geometric range estimation stage.
+
+        Args:
+            model_id: Unique identifier for this stage
+            camera_height_m: Camera mounting height above the sea surface in meters
+            horizon_y: Pixel row of the horizon line; None uses horizon_ratio
+            horizon_ratio: Horizon row as a fraction of the image height
+            focal_length_px: Vertical focal length in pixels; None derives it
+                from vertical_fov_deg and the image height
+            vertical_fov_deg: Vertical field of view of the camera in degrees
+            use_earth_curvature: Intersect the view ray with a spherical earth
+                instead of a flat sea plane
+            max_range_m: Range reported for targets at or above the horizon
+            exclude_classes: List of class names to exclude from range estimation
+            depth_stage: Optional depth stage to calibrate instead of replacing
+            calibration_momentum: EMA weight for depth_scale_factor updates
+        """
+        super().__init__(model_id)
+
+        self.camera_height_m = camera_height_m
+        self.horizon_y = horizon_y
+        self.horizon_ratio = horizon_ratio
+        self.focal_length_px = focal_length_px
+        self.vertical_fov_deg = vertical_fov_deg
+        self.use_earth_curvature = use_earth_curvature
+        self.max_range_m = max_range_m
+        self.exclude_classes = set(exclude_classes or [])
+        self.depth_stage = depth_stage
+        self.calibration_momentum = calibration_momentum
+
+    def _focal_length(self, height: int) -> float:
+        """Vertical focal length in pixels for an image of the given height."""
+        if self.focal_length_px is not None:
+            return self.focal_length_px
+        return (height / 2.0) / math.tan(math.radians(self.vertical_fov_deg) / 2.0)
+
+    def _horizon_row(self, height: int) -> float:
+        """Pixel row of the horizon line for an image of the given height."""
+        if self.horizon_y is not None:
+            return float(self.horizon_y)
+        return height * self.horizon_ratio
+
+    def estimate_ranges(self, bottom_y: np.ndarray, image_height: int) -> np.ndarray:
+        """
+        Estimate ranges in meters for an array of bbox bottom-edge rows.
+
+        Args:
+            bottom_y: Pixel rows of the bbox bottom edges
+            image_height: Height of the image the rows refer to
+
+        Returns:
+            Array of ranges in meters, clipped to max_range_m
+        """
+        h = self.camera_height_m
+        offset = np.asarray(bottom_y, dtype=np.float64) - self._horizon_row(image_height)
+        depression = np.arctan2(offset, self._focal_length(image_height))
+
+        if not self.use_earth_curvature:
+            with np.errstate(divide="ignore"):
+                ranges = np.where(depression > 0, h / np.tan(depression), self.max_range_m)
+            return np.minimum(ranges, self.max_range_m)
+
+        # The visible horizon already sits below true horizontal by the dip angle
+        radius = self.EARTH_RADIUS_M
+        alpha = depression + math.acos(radius / (radius + h))
+        sin_a = np.sin(alpha)
+
+        # Slant distance t along the ray to the sphere: t^2 - 2t(R+h)sin(a) + (2Rh + h^2) = 0
+        discriminant = ((radius + h) * sin_a) ** 2 - (2.0 * radius * h + h * h)
+        hits = (discriminant >= 0) & (alpha > 0)
+        slant = (radius + h) * sin_a - np.sqrt(np.where(hits, discriminant, 0.0))
+
+        # Convert slant distance to range along the surface
+        across = slant * np.cos(alpha)
+        down = (radius + h) - slant * sin_a
+        ranges = np.where(hits, radius * np.arctan2(across, down), self.max_range_m)
+        return np.minimum(ranges, self.max_range_m)
+
+    def _calibrate_depth_scale(
+        self, detections: List[Dict[str, Any]], geometric: np.ndarray
+    ) -> None:
+        """
+        Update the attached depth stage's depth_scale_factor from detections
+        carrying both a depth-stage distance and a valid geometric range.
+        """
+        scale = self.depth_stage.depth_scale_factor
+        ratios = []
+        for detection, geometric_range in zip(detections, geometric):
+            depth_distance = detection.get(OTHER, {}).get(self.DISTANCE)
+            if not depth_distance or geometric_range >= self.max_range_m:
+                continue
+            raw_depth = depth_distance / scale
+            ratios.append(geometric_range / raw_depth)
+
+        if not ratios:
+            return
+
+        momentum = self.calibration_momentum
+        self.depth_stage.depth_scale_factor = (
+            (1.0 - momentum) * scale + momentum * float(np.median(ratios))
+        )
+
+    def forward(
+        self, image: np.ndarray, prev_results: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Add geometric range estimates to detections.
+
+        Args:
+            image: Input image (BGR format from OpenCV)
+            prev_results: List of detections from previous stage
+
+        Returns:
+            Updated list of detections with distance information added
+        """
+        if not prev_results:
+            return []
+
+        height = image.shape[0]
+
+        detections = [
+            detection for detection in prev_results
+            if detection.get(BBOX) and detection.get(CLASS_NAME) not in self.exclude_classes
+        ]
+        if not detections:
+            return prev_results
+
+        bottom_y = np.fromiter(
+            (min(detection[BBOX][3], height - 1) for detection in detections),
+            dtype=np.float64,
+            count=len(detections),
+        )
+        ranges = self.estimate_ranges(bottom_y, height)
+
+        if self.depth_stage is not None:
+            self._calibrate_depth_scale(detections, ranges)
+            return prev_results
+
+        for detection, distance in zip(detections, ranges.tolist()):
+            distance = round(distance, 3)
+            if OTHER not in detection:
+                detection[OTHER] = {}
+            detection[OTHER][self.DISTANCE] = distance
+            detection[CLASS_NAME] = f"{detection[CLASS_NAME]} {str(distance)}m"
+
+            if MODEL_ID not in detection or not detection[MODEL_ID]:
+                detection[MODEL_ID] = self.model_id
+
+        return prev_results
+
+    @property
+    def names(self) -> Dict[int, str]:
+        """
+        Return empty dict as this stage doesn't define new classes.
+        It augments existing detections with range information.
+        """
+        return {}
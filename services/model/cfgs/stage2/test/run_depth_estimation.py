@@ -103,6 +103,7 @@ def _render_with_renderer(
     regions: List,
 ) -> None:
     """Render detections on the frame using the provided renderer."""
+    detections_to_render = []
     for detection in detections:
         detection_to_render = dict(detection)
 
@@ -114,7 +115,9 @@ def _render_with_renderer(
         if not isinstance(class_id_value, int):
             detection_to_render[CLASS_ID] = DEFAULT_CLASS_ID
 
-        renderer.render(frame, detection_to_render, regions, color_manager)
+        detections_to_render.append(detection_to_render)
+
+    renderer.render_frame(frame, detections_to_render, regions, color_manager)
 
 
 def main(image_path: str | None = IMAGE_PATH) -> None:
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from constants.detections_constant import CLASS_NAME, MODEL_ID, OTHER
+from services.model.cfgs.ibase_stage import BaseStage
+
+
+class BaseDirectionEstimationStage3(BaseStage):
+    """
+    Base class for stage 3 direction estimation.
+
+    Holds the frame/flow ring buffers with incremental flow aggregation, the
+    per-bbox flow statistics and the 8-direction compass mapping. Flow-based
+    subclasses provide the flow backend by implementing _compute_pair_flow()
+    and fill frame_history with preprocessed frames via _push_frame(); other
+    subclasses only reuse _directions_from_mean_flows() and
+    _apply_direction_infos().
+    """
+
+    # Key for storing direction info in detection dict
+    DIRECTION = "direction"
+    DIRECTION_ANGLE = "direction_angle"
+    MOVEMENT_SPEED = "movement_speed"
+
+    # Running flow sum is rebuilt from the ring buffer every N updates to bound drift
+    _FLOW_SUM_RESYNC_INTERVAL = 256
+
+    # 8-directional compass: bin edges over angles in [0, 360) and their names
+    # (0 is right, positive is clockwise in image coordinates)
+    _COMPASS_BIN_EDGES = np.array([22.5, 67.5, 112.5, 157.5, 202.5, 247.5, 292.5, 337.5])
+    _COMPASS_NAMES = np.array(
+        ["right", "down-right", "down", "down-left", "left", "up-left", "up", "up-right", "right"]
+    )
+
+    def __init__(self, model_id: str, flow_threshold: float = 0.5, frame_history_size: int = 3):
+        """
+        Initialize direction estimation base stage.
+
+        Args:
+            model_id: Unique identifier for this stage
+            flow_threshold: Minimum optical flow magnitude to consider as movement
+            frame_history_size: Number of frames to maintain for flow computation
+        """
+        super().__init__(model_id)
+
+        self.flow_threshold = flow_threshold
+        self.frame_history_size = max(2, frame_history_size)  # Minimum 2 frames needed
+
+        # Frame (H, W) and flow working (H, W) for the current stream
+        self._source_size: Optional[Tuple[int, int]] = None
+        self._flow_size: Optional[Tuple[int, int]] = None
+
+        # Store frame history using deque for efficient memory management
+        self.frame_history = deque(maxlen=self.frame_history_size)
+
+        # Ring buffer of flow fields alongside the frame history:
+        # flow_history[i] is the flow from frame_history[i] to frame_history[i + 1],
+        # or None while that pair has not been computed yet
+        self.flow_history = deque(maxlen=self.frame_history_size - 1)
+        self._flow_sum: Optional[np.ndarray] = None
+        self._flow_count = 0
+        self._flow_updates_since_resync = 0
+
+    def _compute_pair_flow(self, prev_frame: Any, curr_frame: Any) -> Optional[np.ndarray]:
+        """
+        Compute optical flow between two preprocessed frames from frame_history.
+
+        Returns:
+            Optical flow field on the working grid (h x w x 2: dx, dy), with
+            vectors expressed in frame pixels, or None on failure
+        """
+        raise NotImplementedError("Must implement _compute_pair_flow() in subclass")
+
+    def _to_flow_coords(self, bboxes: List[List[int]] | np.ndarray) -> np.ndarray:
+        """Map frame-space bboxes [x1, y1, x2, y2] onto the flow working grid (K x 4)."""
+        height, width = self._source_size
+        flow_h, flow_w = self._flow_size
+        boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        return boxes * np.array([flow_w / width, flow_h / height, flow_w / width, flow_h / height])
+
+    def _push_frame(self, frame: Any) -> None:
+        """
+        Append a frame to the history and open a pending slot for the flow
+        between it and the previous frame, evicting the oldest flow if needed.
+        """
+        self.frame_history.append(frame)
+        if len(self.frame_history) < 2:
+            return
+
+        if len(self.flow_history) == self.flow_history.maxlen:
+            evicted = self.flow_history[0]
+            if evicted is not None:
+                self._flow_sum -= evicted
+                self._flow_count -= 1
+
+        self.flow_history.append(None)
+
+    def _add_flow(self, index: int, flow: np.ndarray) -> None:
+        """Store a computed flow in the ring buffer and add it to the running sum."""
+        if self._flow_sum is not None and self._flow_sum.shape != flow.shape:
+            # Resolution changed: drop flows computed at the old resolution
+            for i in range(len(self.flow_history)):
+                self.flow_history[i] = None
+            self._flow_sum = None
+            self._flow_count = 0
+
+        if self._flow_sum is None:
+            self._flow_sum = np.zeros(flow.shape, dtype=np.float64)
+
+        self.flow_history[index] = flow
+        self._flow_sum += flow
+        self._flow_count += 1
+        self._flow_updates_since_resync += 1
+
+        if self._flow_updates_since_resync >= self._FLOW_SUM_RESYNC_INTERVAL:
+            self._flow_sum.fill(0.0)
+            for stored in self.flow_history:
+                if stored is not None:
+                    self._flow_sum += stored
+            self._flow_updates_since_resync = 0
+
+    def _compute_multi_frame_flow(self) -> Optional[np.ndarray]:
+        """
+        Compute aggregated optical flow across multiple frames in history.
+
+        Only frame pairs whose flow is not yet in the ring buffer are sent to
+        the flow backend, so in steady state this is a single flow computation
+        per frame regardless of the history size.
+
+        Returns:
+            Aggregated optical flow field, or None if insufficient frames
+        """
+        if len(self.frame_history) < 2:
+            return None
+
+        for i, flow in enumerate(self.flow_history):
+            if flow is not None:
+                continue
+
+            flow = self._compute_pair_flow(self.frame_history[i], self.frame_history[i + 1])
+            if flow is not None:
+                self._add_flow(i, flow)
+
+        if self._flow_count == 0:
+            return None
+
+        # Aggregate flows by averaging
+        # This helps smooth out noise and get more stable direction estimates
+        aggregated_flow = (self._flow_sum / self._flow_count).astype(np.float32)
+
+        return aggregated_flow
+
+    @staticmethod
+    def _summed_area_table(flow: np.ndarray) -> np.ndarray:
+        """
+        Build a zero-padded summed-area table of a flow field.
+
+        Args:
+            flow: Flow field(s) of shape (..., H, W, 2)
+
+        Returns:
+            Table of shape (..., H + 1, W + 1, 2) where entry [y, x] holds the
+            sum of flow[:y, :x]
+        """
+        *lead, height, width, channels = flow.shape
+        table = np.zeros((*lead, height + 1, width + 1, channels), dtype=np.float64)
+        inner = table[..., 1:, 1:, :]
+        np.cumsum(flow, axis=-3, dtype=np.float64, out=inner)
+        np.cumsum(inner, axis=-2, out=inner)
+        return table
+
+    @staticmethod
+    def _box_sums(
+            table: np.ndarray, x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray
+    ) -> np.ndarray:
+        """Sum of the flow inside each [x1, x2) x [y1, y2) box from a summed-area table."""
+        return table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
+
+    def _box_mean_flows(
+            self, boxes: np.ndarray, optical_flow: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Mean optical flow inside every bounding box at once.
+
+        Args:
+            boxes: K x 4 boxes [x1, y1, x2, y2] on the flow grid
+            optical_flow: Optical flow field from the flow backend (H x W x 2)
+
+        Returns:
+            (mean_flows, valid): K x 2 mean (dx, dy) per box, and a mask of
+            boxes with a non-empty region inside the flow field
+        """
+        boxes = np.asarray(boxes).reshape(-1, 4).astype(np.int64)
+
+        # Clip to flow bounds
+        h, w = optical_flow.shape[:2]
+        x1 = np.clip(boxes[:, 0], 0, w - 1)
+        x2 = np.clip(boxes[:, 2], 1, w)
+        y1 = np.clip(boxes[:, 1], 0, h - 1)
+        y2 = np.clip(boxes[:, 3], 1, h)
+        valid = (x2 > x1) & (y2 > y1)
+
+        table = self._summed_area_table(optical_flow)
+        area = np.maximum((x2 - x1) * (y2 - y1), 1)
+        mean_flows = self._box_sums(table, x1, y1, x2, y2) / area[:, None]
+
+        return mean_flows, valid
+
+    def _estimate_directions_for_bboxes(
+            self, boxes: np.ndarray, optical_flow: np.ndarray
+    ) -> List[Dict[str, float]]:
+        """
+        Estimate direction of movement for bounding boxes using optical flow.
+
+        Args:
+            boxes: K x 4 boxes [x1, y1, x2, y2] on the flow grid
+            optical_flow: Optical flow field from the flow backend
+
+        Returns:
+            List of dicts with direction, angle, and speed info, one per box
+        """
+        if len(boxes) == 0:
+            return []
+
+        mean_flows, valid = self._box_mean_flows(boxes, optical_flow)
+        return self._directions_from_mean_flows(mean_flows, valid)
+
+    def _directions_from_mean_flows(
+            self, mean_flows: np.ndarray, valid: Optional[np.ndarray] = None
+    ) -> List[Dict[str, float]]:
+        """
+        Build direction info from the mean flow vectors of detections.
+
+        Args:
+            mean_flows: K x 2 mean flow (dx, dy) in frame pixels
+            valid: Optional mask; invalid entries are reported as stationary
+
+        Returns:
+            List of dicts with direction, angle, and speed info
+        """
+        mean_flows = np.asarray(mean_flows, dtype=np.float64).reshape(-1, 2)
+        dx = mean_flows[:, 0]
+        dy = mean_flows[:, 1]
+
+        # Compute magnitude (speed); below threshold the object is stationary
+        speeds = np.hypot(dx, dy)
+        moving = speeds >= self.flow_threshold
+        if valid is not None:
+            moving &= valid
+
+        # Compute angle (-180 to 180 degrees, where 0 is right, positive is clockwise)
+        angles = np.degrees(np.arctan2(dy, dx))
+        directions = self._angles_to_directions(angles)
+
+        stationary = {
+            self.DIRECTION: "stationary",
+            self.DIRECTION_ANGLE: 0.0,
+            self.MOVEMENT_SPEED: 0.0,
+        }
+        return [
+            {
+                self.DIRECTION: direction,
+                self.DIRECTION_ANGLE: angle,
+                self.MOVEMENT_SPEED: speed,
+            } if is_moving else dict(stationary)
+            for direction, angle, speed, is_moving in zip(
+                directions.tolist(),
+                np.round(angles, 2).tolist(),
+                np.round(speeds, 2).tolist(),
+                moving.tolist(),
+            )
+        ]
+
+    def _angles_to_directions(self, angles: np.ndarray) -> np.ndarray:
+        """
+        Convert angles to direction names.
+
+        Args:
+            angles: Angles in degrees (any range)
+
+        Returns:
+            Array of direction names
+        """
+        return self._COMPASS_NAMES[np.digitize(np.mod(angles, 360.0), self._COMPASS_BIN_EDGES)]
+
+    def _angle_to_direction(self, angle: float) -> str:
+        """
+        Convert angle to direction name.
+
+        Args:
+            angle: Angle in degrees (-180 to 180)
+
+        Returns:
+            Direction name
+        """
+        return str(self._angles_to_directions(np.asarray([angle]))[0])
+
+    def _apply_direction_infos(
+            self, detections: List[Dict[str, Any]], direction_infos: List[Dict[str, float]]
+    ) -> None:
+        """Write direction info into detections and tag them with the direction."""
+        for detection, direction_info in zip(detections, direction_infos):
+            # Add direction information to detection
+            if OTHER not in detection:
+                detection[OTHER] = {}
+
+            detection[OTHER].update(direction_info)
+
+            # Update class name with direction
+            class_name = detection.get(CLASS_NAME, "unknown")
+            direction = direction_info.get(self.DIRECTION, "unknown")
+            detection[CLASS_NAME] = f"{class_name} ({direction})"
+
+            # Add model_id if not present
+            if MODEL_ID not in detection or not detection[MODEL_ID]:
+                detection[MODEL_ID] = self.model_id
+
+    def reset_history(self):
+        """Reset the frame history (useful when starting a new video sequence)."""
+        self.frame_history.clear()
+        self.flow_history.clear()
+        self._flow_sum = None
+        self._flow_count = 0
+        self._flow_updates_since_resync = 0
+        print(f"[{type(self).__name__}] Frame history cleared")
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from constants.detections_constant import BBOX
+from services.model.cfgs.stage3.base_direction_estimation_stage3 import BaseDirectionEstimationStage3
+
+
+class OpenCVFlowDirectionEstimationStage3(BaseDirectionEstimationStage3):
+    """
+    Stage 3 - Direction estimation using classical OpenCV optical flow.
+    CPU-friendly alternative to RAFTDirectionEstimationStage3 that emits the
+    same direction fields.
+
+    Supported flow backends:
+    - "dis": Dense Inverse Search, fast coarse-to-fine patch matching
+    - "farneback": Polynomial-expansion based dense flow
+
+    Both run on downscaled grayscale frames. Pick the stage per camera when
+    building its pipeline.
+    """
+
+    FLOW_BACKENDS = ("dis", "farneback")
+
+    # Farneback parameters (pyr_scale, levels, winsize, iterations, poly_n, poly_sigma, flags)
+    _FARNEBACK_PARAMS = (0.5, 3, 15, 3, 5, 1.2, 0)
+
+    def __init__(
+            self,
+            model_id: str,
+            flow_backend: str = "dis",
+            flow_threshold: float = 0.5,
+            frame_history_size: int = 3,
+            flow_scale: float = 0.5,
+            dis_preset: int = cv2.DISOPTICAL_FLOW_PRESET_FAST,
+    ):
+        """
+        Initialize OpenCV optical-flow direction estimation stage.
+
+        Args:
+            model_id: Unique identifier for this stage
+            flow_backend: Flow algorithm ("dis" or "farneback")
+            flow_threshold: Minimum optical flow magnitude to consider as movement
+            frame_history_size: Number of frames to maintain for flow computation
+            flow_scale: Working resolution as a fraction of the frame size
+            dis_preset: OpenCV DIS preset (ULTRAFAST, FAST or MEDIUM)
+        """
+        super().__init__(model_id, flow_threshold, frame_history_size)
+
+        flow_backend = flow_backend.lower().strip()
+        if flow_backend not in self.FLOW_BACKENDS:
+            available = ", ".join(self.FLOW_BACKENDS)
+            raise ValueError(
+                f"Unknown flow backend: '{flow_backend}'. "
+                f"Available flow backends: {available}"
+            )
+
+        self.flow_backend = flow_backend
+        self.flow_scale = flow_scale
+        self._dis = cv2.DISOpticalFlow_create(dis_preset) if flow_backend == "dis" else None
+
+        # Preallocated grayscale buffers: one full-resolution scratch frame and
+        # a ring of working-resolution frames referenced by frame_history
+        self._gray_frame: Optional[np.ndarray] = None
+        self._gray_ring: Optional[np.ndarray] = None
+        self._ring_slot = 0
+
+        print(f"[OpenCVFlowDirectionEstimationStage3] Using flow backend: {self.flow_backend}")
+        print(f"[OpenCVFlowDirectionEstimationStage3] Frame history size: {self.frame_history_size}")
+
+    def _working_size(self, height: int, width: int) -> Tuple[int, int]:
+        """Flow working (H, W) for a frame size."""
+        return max(1, int(round(height * self.flow_scale))), max(1, int(round(width * self.flow_scale)))
+
+    def _preprocess_frame(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Convert a BGR frame to downscaled grayscale in the next ring buffer slot.
+
+        Args:
+            frame: Input frame (BGR format from OpenCV)
+
+        Returns:
+            Grayscale frame at working resolution (view into the ring buffer)
+        """
+        height, width = frame.shape[:2]
+        if self._gray_ring is None or self._source_size != (height, width):
+            # New stream resolution: reallocate buffers and drop stale history
+            self.reset_history()
+            self._source_size = (height, width)
+            self._flow_size = self._working_size(height, width)
+            self._gray_frame = np.empty((height, width), dtype=np.uint8)
+            self._gray_ring = np.empty((self.frame_history_size, *self._flow_size), dtype=np.uint8)
+
+        slot = self._gray_ring[self._ring_slot]
+        self._ring_slot = (self._ring_slot + 1) % self.frame_history_size
+
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray_frame)
+        if self._flow_size == self._source_size:
+            slot[...] = self._gray_frame
+        else:
+            flow_h, flow_w = self._flow_size
+            cv2.resize(self._gray_frame, (flow_w, flow_h), dst=slot, interpolation=cv2.INTER_AREA)
+
+        return slot
+
+    def _compute_pair_flow(
+            self, prev_frame: np.ndarray, curr_frame: np.ndarray
+    ) -> Optional[np.ndarray]:
+        """
+        Compute optical flow between two grayscale frames with the configured backend.
+
+        Args:
+            prev_frame: Previous grayscale frame at working resolution
+            curr_frame: Current grayscale frame at working resolution
+
+        Returns:
+            Optical flow field at working resolution (h x w x 2: dx, dy),
+            with vectors expressed in frame pixels
+        """
+        try:
+            if self._dis is not None:
+                flow = self._dis.calc(prev_frame, curr_frame, None)
+            else:
+                flow = cv2.calcOpticalFlowFarneback(prev_frame, curr_frame, None, *self._FARNEBACK_PARAMS)
+        except cv2.error as e:
+            print(f"[OpenCVFlowDirectionEstimationStage3] Flow computation error: {e}")
+            return None
+
+        # Rescale flow vectors from working-grid pixels to frame pixels
+        if self._flow_size != self._source_size:
+            flow[..., 0] *= self._source_size[1] / self._flow_size[1]
+            flow[..., 1] *= self._source_size[0] / self._flow_size[0]
+
+        return flow
+
+    def forward(
+            self, image: np.ndarray, prev_results: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run direction estimation on detections using classical optical flow.
+
+        Args:
+            image: Input image (BGR format from OpenCV)
+            prev_results: List of detections from previous stage
+
+        Returns:
+            Updated list of detections with direction information added
+        """
+        # Add current frame to history, even if no detections
+        self._push_frame(self._preprocess_frame(image))
+
+        if not prev_results:
+            return []
+
+        optical_flow = self._compute_multi_frame_flow()
+        if optical_flow is None:
+            return prev_results
+
+        detections = [detection for detection in prev_results if detection.get(BBOX)]
+        direction_infos = self._estimate_directions_for_bboxes(
+            self._to_flow_coords([detection[BBOX][:4] for detection in detections]), optical_flow
+        )
+        self._apply_direction_infos(detections, direction_infos)
+
+        return prev_results
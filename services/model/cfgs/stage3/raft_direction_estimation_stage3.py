@@ -1,20 +1,20 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Optional
-from collections import deque
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-import cv2
 import numpy as np
 import torch
-import torchvision.transforms as transforms
+import torch.nn.functional as F
+from torchvision.ops import roi_align
 from torchvision.models.optical_flow import raft_large, raft_small, Raft_Large_Weights, Raft_Small_Weights
 
-from constants.detections_constant import BBOX, CLASS_ID, CLASS_NAME, CONFIDENCE, MODEL_ID, OTHER
-from services.model.cfgs.ibase_stage import BaseStage
+from constants.detections_constant import BBOX
+from services.model.cfgs.stage3.base_direction_estimation_stage3 import BaseDirectionEstimationStage3
 
 
-class RAFTDirectionEstimationStage3(BaseStage):
+class RAFTDirectionEstimationStage3(BaseDirectionEstimationStage3):
     """
     Stage 3 - Direction estimation using RAFT optical flow.
     Estimates movement direction for detected objects using RAFT (Recurrent All-Pairs Field Transforms).
@@ -25,10 +25,18 @@ class RAFTDirectionEstimationStage3(BaseStage):
     - Produces high-quality dense optical flow
     """
 
-    # Key for storing direction info in detection dict
-    DIRECTION = "direction"
-    DIRECTION_ANGLE = "direction_angle"
-    MOVEMENT_SPEED = "movement_speed"
+    # RAFT needs input sides divisible by 8
+    _RAFT_SIZE_MULTIPLE = 8
+
+    # Adaptive refinement-iteration controller
+    _LATENCY_EMA_ALPHA = 0.2
+    _LATENCY_HEADROOM = 0.7  # raise iterations when under this fraction of the budget
+    _FLOW_UPDATES_STEP_DOWN = 2
+    _FLOW_UPDATES_STEP_UP = 1
+    _ADAPT_COOLDOWN_FRAMES = 5
+
+    # Minimum padding around detections when cropping flow ROIs (working-grid pixels)
+    _ROI_MIN_PADDING_PX = 16
 
     def __init__(
             self,
@@ -38,6 +46,15 @@ class RAFTDirectionEstimationStage3(BaseStage):
             frame_history_size: int = 3,
             raft_model_type: str = "small",  # "small" or "large"
             use_pretrained: bool = True,
+            flow_scale: float = 1.0,
+            num_flow_updates: int = 12,
+            latency_budget_ms: Optional[float] = None,
+            min_flow_updates: int = 4,
+            max_flow_updates: Optional[int] = None,
+            roi_mode: bool = False,
+            roi_size: int = 128,
+            roi_padding: float = 0.5,
+            roi_max_coverage: float = 0.4,
     ):
         """
         Initialize RAFT direction estimation stage.
@@ -49,28 +66,53 @@ class RAFTDirectionEstimationStage3(BaseStage):
             frame_history_size: Number of frames to maintain for flow computation
             raft_model_type: RAFT model variant ("small" or "large")
             use_pretrained: Whether to use pretrained weights
+            flow_scale: Working resolution for RAFT as a fraction of the frame size
+                (rounded to multiples of 8); bboxes and flow vectors are mapped
+                between frame and working resolution
+            num_flow_updates: RAFT refinement iterations per flow computation
+            latency_budget_ms: Per-frame latency budget; when set, num_flow_updates
+                is lowered while the stage runs over budget and raised again
+                when there is headroom
+            min_flow_updates: Lower bound for adaptive num_flow_updates
+            max_flow_updates: Upper bound for adaptive num_flow_updates
+                (defaults to num_flow_updates)
+            roi_mode: Run RAFT only on padded ROI pairs around (clusters of)
+                detections, batched into a single call
+            roi_size: Side length ROIs are resampled to before RAFT (multiple of 8)
+            roi_padding: ROI padding as a fraction of the larger bbox side
+            roi_max_coverage: Fall back to full-frame flow when the ROIs cover
+                more than this fraction of the frame
         """
-        super().__init__(model_id)
+        super().__init__(model_id, flow_threshold, frame_history_size)
 
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        self.flow_threshold = flow_threshold
-        self.frame_history_size = max(2, frame_history_size)  # Minimum 2 frames needed
         self.raft_model_type = raft_model_type
+        self.flow_scale = flow_scale
+
+        self.num_flow_updates = num_flow_updates
+        self.latency_budget_ms = latency_budget_ms
+        self.min_flow_updates = min(min_flow_updates, num_flow_updates)
+        self.max_flow_updates = max_flow_updates or num_flow_updates
+        self._latency_ema_ms: Optional[float] = None
+        self._adapt_cooldown = 0
+
+        self.roi_mode = roi_mode
+        self.roi_size = max(self._RAFT_SIZE_MULTIPLE, roi_size // self._RAFT_SIZE_MULTIPLE * self._RAFT_SIZE_MULTIPLE)
+        self.roi_padding = roi_padding
+        self.roi_max_coverage = roi_max_coverage
 
         # Initialize RAFT model
         self._init_raft_model(use_pretrained)
 
-        # Store frame history using deque for efficient memory management
-        self.frame_history = deque(maxlen=self.frame_history_size)
-
-        # RAFT preprocessing transform
-        self.transform = transforms.Compose([
-            transforms.ToTensor(),
-        ])
+        # frame_history entries are views into a preallocated ring buffer of
+        # RAFT input tensors, so each frame is preprocessed exactly once
+        self._tensor_ring: Optional[torch.Tensor] = None
+        self._ring_slot = 0
 
         print(f"[RAFTDirectionEstimationStage3] Initialized on {self.device}")
         print(f"[RAFTDirectionEstimationStage3] Using RAFT model: {self.raft_model_type}")
         print(f"[RAFTDirectionEstimationStage3] Frame history size: {self.frame_history_size}")
+        print(f"[RAFTDirectionEstimationStage3] Flow scale: {self.flow_scale}, flow updates: {self.num_flow_updates}")
 
     def _init_raft_model(self, use_pretrained: bool):
         """Initialize RAFT model."""
@@ -92,52 +134,99 @@ class RAFTDirectionEstimationStage3(BaseStage):
 
     def _preprocess_frame(self, frame: np.ndarray) -> torch.Tensor:
         """
-        Preprocess frame for RAFT model.
+        Preprocess frame for RAFT model into the next ring buffer slot.
 
         Args:
             frame: Input frame (BGR format from OpenCV)
 
         Returns:
-            Preprocessed tensor ready for RAFT
+            Preprocessed tensor (3 x H x W, RGB in [0, 1]) ready for RAFT.
+            The tensor is a view into the ring buffer and is overwritten once
+            it falls out of the frame history.
         """
-        # Convert BGR to RGB
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Convert to tensor and normalize to [0, 1]
-        frame_tensor = self.transform(frame_rgb)
-
-        # Add batch dimension
-        frame_tensor = frame_tensor.unsqueeze(0).to(self.device)
-
-        return frame_tensor
+        height, width = frame.shape[:2]
+        if self._tensor_ring is None or self._source_size != (height, width):
+            # Allocate the ring on the first frame; on a resolution change
+            # also drop the stale history of the previous resolution
+            if self._tensor_ring is not None:
+                self.reset_history()
+            self._ring_slot = 0
+            self._source_size = (height, width)
+            self._flow_size = self._working_size(height, width)
+            self._tensor_ring = torch.empty(
+                (self.frame_history_size, 3, *self._flow_size),
+                dtype=torch.float32,
+                device=self.device,
+            )
+
+        slot = self._tensor_ring[self._ring_slot]
+        self._ring_slot = (self._ring_slot + 1) % self.frame_history_size
+
+        # Upload as uint8, then convert BGR HWC -> RGB CHW and normalize to [0, 1] in place
+        frame_uint8 = torch.from_numpy(np.ascontiguousarray(frame)).to(self.device, non_blocking=True)
+        frame_chw = frame_uint8.permute(2, 0, 1).flip(0)
+        if self._flow_size == self._source_size:
+            slot.copy_(frame_chw)
+        else:
+            slot.copy_(
+                F.interpolate(
+                    frame_chw.unsqueeze(0).float(),
+                    size=self._flow_size,
+                    mode="bilinear",
+                    align_corners=False,
+                    antialias=True,
+                )[0]
+            )
+        slot.div_(255.0)
+
+        return slot
+
+    def _working_size(self, height: int, width: int) -> Tuple[int, int]:
+        """RAFT working (H, W) for a frame size, rounded to multiples of 8."""
+        multiple = self._RAFT_SIZE_MULTIPLE
+        flow_h = max(multiple, int(round(height * self.flow_scale / multiple)) * multiple)
+        flow_w = max(multiple, int(round(width * self.flow_scale / multiple)) * multiple)
+        return flow_h, flow_w
+
+    def _compute_pair_flow(
+            self, prev_frame: torch.Tensor, curr_frame: torch.Tensor
+    ) -> Optional[np.ndarray]:
+        """Flow backend hook: RAFT flow between two cached frame tensors."""
+        return self._compute_raft_flow(prev_frame, curr_frame)
 
     def _compute_raft_flow(
-            self, prev_frame: np.ndarray, curr_frame: np.ndarray
+            self, prev_tensor: torch.Tensor, curr_tensor: torch.Tensor
     ) -> Optional[np.ndarray]:
         """
         Compute optical flow between two frames using RAFT.
 
         Args:
-            prev_frame: Previous frame (BGR format)
-            curr_frame: Current frame (BGR format)
+            prev_tensor: Previous frame, preprocessed (3 x H x W)
+            curr_tensor: Current frame, preprocessed (3 x H x W)
 
         Returns:
-            Optical flow field (H x W x 2: dx, dy)
+            Optical flow field at working resolution (h x w x 2: dx, dy),
+            with vectors expressed in frame pixels
         """
-        if prev_frame is None or curr_frame is None:
+        if prev_tensor is None or curr_tensor is None:
             return None
 
         try:
-            # Preprocess frames
-            prev_tensor = self._preprocess_frame(prev_frame)
-            curr_tensor = self._preprocess_frame(curr_frame)
-
             # Compute flow using RAFT
             with torch.no_grad():
                 # RAFT returns a list of flow predictions (multiple iterations)
                 # We use the final prediction (last element)
-                flow_predictions = self.raft_model(prev_tensor, curr_tensor)
-                flow = flow_predictions[-1]  # Shape: [1, 2, H, W]
+                flow_predictions = self.raft_model(
+                    prev_tensor.unsqueeze(0),
+                    curr_tensor.unsqueeze(0),
+                    num_flow_updates=self.num_flow_updates,
+                )
+                flow = flow_predictions[-1]  # Shape: [1, 2, h, w]
+
+                # Rescale flow vectors from working-grid pixels to frame pixels
+                if self._flow_size != self._source_size:
+                    flow[:, 0].mul_(self._source_size[1] / self._flow_size[1])
+                    flow[:, 1].mul_(self._source_size[0] / self._flow_size[0])
 
             # Convert to numpy: [1, 2, H, W] -> [H, W, 2]
             flow_np = flow[0].permute(1, 2, 0).cpu().numpy()
@@ -148,124 +237,117 @@ class RAFTDirectionEstimationStage3(BaseStage):
             print(f"[RAFTDirectionEstimationStage3] RAFT flow computation error: {e}")
             return None
 
-    def _compute_multi_frame_flow(self) -> Optional[np.ndarray]:
+    def _cluster_rois(
+            self, boxes: np.ndarray, width: int, height: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Compute aggregated optical flow across multiple frames in history using RAFT.
+        Pad boxes into ROIs and merge overlapping ROIs into clusters.
+
+        Args:
+            boxes: K x 4 boxes [x1, y1, x2, y2] on the flow working grid
+            width: Working grid width
+            height: Working grid height
 
         Returns:
-            Aggregated optical flow field, or None if insufficient frames
+            (rois, membership): R x 4 ROI rectangles and, for each box, the
+            index of the ROI that contains it
         """
-        if len(self.frame_history) < 2:
-            return None
+        sides = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        pad = np.maximum(self._ROI_MIN_PADDING_PX, self.roi_padding * sides)[:, None]
+        padded = np.hstack([boxes[:, :2] - pad, boxes[:, 2:] + pad])
+        padded = np.clip(padded, 0, [width, height, width, height])
+
+        rois: List[np.ndarray] = []
+        members: List[List[int]] = []
+        for index, roi in enumerate(padded):
+            roi = roi.copy()
+            group = [index]
+            merged = True
+            while merged:
+                merged = False
+                for other in range(len(rois) - 1, -1, -1):
+                    existing = rois[other]
+                    if (roi[0] < existing[2] and existing[0] < roi[2]
+                            and roi[1] < existing[3] and existing[1] < roi[3]):
+                        roi[:2] = np.minimum(roi[:2], existing[:2])
+                        roi[2:] = np.maximum(roi[2:], existing[2:])
+                        group.extend(members.pop(other))
+                        rois.pop(other)
+                        merged = True
+            rois.append(roi)
+            members.append(group)
+
+        membership = np.empty(len(boxes), dtype=np.int64)
+        for roi_index, group in enumerate(members):
+            membership[group] = roi_index
+
+        return np.asarray(rois, dtype=np.float32), membership
+
+    def _compute_roi_mean_flows(self, bboxes: List[List[int]]) -> Optional[np.ndarray]:
+        """
+        Compute the mean flow of each bbox from RAFT run on ROI crops only.
 
-        # Compute flow between consecutive frame pairs
-        flow_fields = []
-        for i in range(len(self.frame_history) - 1):
-            prev_frame = self.frame_history[i]
-            curr_frame = self.frame_history[i + 1]
+        ROIs around (clusters of) detections are cropped from the two newest
+        frames with roi_align, resampled to roi_size x roi_size and sent to
+        RAFT as one batch.
 
-            flow = self._compute_raft_flow(prev_frame, curr_frame)
-            if flow is not None:
-                flow_fields.append(flow)
+        Args:
+            bboxes: Bounding boxes [x1, y1, x2, y2] in frame coordinates
 
-        if not flow_fields:
+        Returns:
+            K x 2 mean flow (dx, dy) per bbox in frame pixels, or None when
+            ROI coverage is too high or flow could not be computed
+        """
+        if len(self.frame_history) < 2 or not bboxes:
             return None
 
-        # Aggregate flows by averaging
-        # This helps smooth out noise and get more stable direction estimates
-        aggregated_flow = np.mean(flow_fields, axis=0)
-
-        return aggregated_flow
-
-    def _estimate_direction_for_bbox(
-            self, bbox: List[int] | np.ndarray, optical_flow: np.ndarray
-    ) -> Dict[str, float]:
-        """
-        Estimate direction of movement for a bounding box using optical flow.
+        flow_h, flow_w = self._flow_size
+        boxes = self._to_flow_coords(bboxes).astype(np.float32)
+        rois, membership = self._cluster_rois(boxes, flow_w, flow_h)
 
-        Args:
-            bbox: Bounding box [x1, y1, x2, y2]
-            optical_flow: Optical flow field from RAFT
+        roi_w = np.maximum(rois[:, 2] - rois[:, 0], 1.0)
+        roi_h = np.maximum(rois[:, 3] - rois[:, 1], 1.0)
+        if float(np.sum(roi_w * roi_h)) > self.roi_max_coverage * flow_w * flow_h:
+            return None
 
-        Returns:
-            Dict with direction, angle, and speed info
-        """
-        x1, y1, x2, y2 = map(int, bbox)
-
-        # Clip to flow bounds
-        h, w = optical_flow.shape[:2]
-        x1 = max(0, min(w - 1, x1))
-        x2 = max(1, min(w, x2))
-        y1 = max(0, min(h - 1, y1))
-        y2 = max(1, min(h, y2))
-
-        # Extract flow in bbox region
-        flow_region = optical_flow[y1:y2, x1:x2]
-
-        if flow_region.size == 0:
-            return {
-                self.DIRECTION: "stationary",
-                self.DIRECTION_ANGLE: 0.0,
-                self.MOVEMENT_SPEED: 0.0,
-            }
-
-        # Compute mean flow
-        mean_flow = np.mean(flow_region, axis=(0, 1))
-        dx, dy = mean_flow
-
-        # Compute magnitude (speed)
-        speed = np.sqrt(dx ** 2 + dy ** 2)
-
-        # If speed below threshold, object is stationary
-        if speed < self.flow_threshold:
-            return {
-                self.DIRECTION: "stationary",
-                self.DIRECTION_ANGLE: 0.0,
-                self.MOVEMENT_SPEED: 0.0,
-            }
-
-        # Compute angle (-180 to 180 degrees, where 0 is right, positive is clockwise)
-        angle = np.degrees(np.arctan2(dy, dx))
-
-        # Determine direction name based on angle
-        direction = self._angle_to_direction(angle)
-
-        return {
-            self.DIRECTION: direction,
-            self.DIRECTION_ANGLE: round(float(angle), 2),
-            self.MOVEMENT_SPEED: round(float(speed), 2),
-        }
-
-    def _angle_to_direction(self, angle: float) -> str:
-        """
-        Convert angle to direction name.
+        size = self.roi_size
+        try:
+            roi_boxes = torch.from_numpy(
+                np.hstack([np.zeros((len(rois), 1), dtype=np.float32), rois])
+            ).to(self.device)
 
-        Args:
-            angle: Angle in degrees (-180 to 180)
+            with torch.no_grad():
+                prev_rois = roi_align(self.frame_history[-2].unsqueeze(0), roi_boxes, (size, size), aligned=True)
+                curr_rois = roi_align(self.frame_history[-1].unsqueeze(0), roi_boxes, (size, size), aligned=True)
+                flow_predictions = self.raft_model(prev_rois, curr_rois, num_flow_updates=self.num_flow_updates)
+                roi_flows = flow_predictions[-1].cpu().numpy()  # Shape: [R, 2, size, size]
+        except Exception as e:
+            print(f"[RAFTDirectionEstimationStage3] ROI flow computation error: {e}")
+            return None
 
-        Returns:
-            Direction name
-        """
-        # Normalize angle to 0-360
-        angle = angle % 360
-
-        # 8-directional compass
-        if 337.5 <= angle or angle < 22.5:
-            return "right"
-        elif 22.5 <= angle < 67.5:
-            return "down-right"
-        elif 67.5 <= angle < 112.5:
-            return "down"
-        elif 112.5 <= angle < 157.5:
-            return "down-left"
-        elif 157.5 <= angle < 202.5:
-            return "left"
-        elif 202.5 <= angle < 247.5:
-            return "up-left"
-        elif 247.5 <= angle < 292.5:
-            return "up"
-        else:  # 292.5 <= angle < 337.5
-            return "up-right"
+        # Box coordinates inside their ROI's resampled grid
+        owner = rois[membership]
+        grid_x = size / roi_w[membership]
+        grid_y = size / roi_h[membership]
+        gx1 = np.clip(((boxes[:, 0] - owner[:, 0]) * grid_x).astype(int), 0, size - 1)
+        gy1 = np.clip(((boxes[:, 1] - owner[:, 1]) * grid_y).astype(int), 0, size - 1)
+        gx2 = np.clip(np.ceil((boxes[:, 2] - owner[:, 0]) * grid_x).astype(int), gx1 + 1, size)
+        gy2 = np.clip(np.ceil((boxes[:, 3] - owner[:, 1]) * grid_y).astype(int), gy1 + 1, size)
+
+        # Per-box means from summed-area tables of all ROI flows at once
+        table = self._summed_area_table(roi_flows.transpose(0, 2, 3, 1))
+        sums = (
+            table[membership, gy2, gx2] - table[membership, gy1, gx2]
+            - table[membership, gy2, gx1] + table[membership, gy1, gx1]
+        )
+        mean_flows = sums / ((gx2 - gx1) * (gy2 - gy1))[:, None]
+
+        # ROI grid pixels -> working grid pixels -> frame pixels
+        height, width = self._source_size
+        mean_flows[:, 0] *= (roi_w[membership] / size) * (width / flow_w)
+        mean_flows[:, 1] *= (roi_h[membership] / size) * (height / flow_h)
+
+        return mean_flows
 
     def forward(
             self, image: np.ndarray, prev_results: Optional[List[Dict[str, Any]]] = None
@@ -282,43 +364,66 @@ class RAFTDirectionEstimationStage3(BaseStage):
         """
         if not prev_results:
             # Add frame to history even if no detections
-            self.frame_history.append(image.copy())
+            self._push_frame(self._preprocess_frame(image))
             return []
 
-        # Add current frame to history
-        self.frame_history.append(image.copy())
+        start = time.perf_counter()
 
-        # Compute optical flow using RAFT and frame history
-        optical_flow = self._compute_multi_frame_flow()
-
-        # Process each detection
-        if optical_flow is not None:
-            for detection in prev_results:
-                bbox = detection.get(BBOX)
-                if not bbox:
-                    continue
+        # Add current frame to history
+        self._push_frame(self._preprocess_frame(image))
 
-                # Estimate direction for this detection
-                direction_info = self._estimate_direction_for_bbox(bbox, optical_flow)
+        detections = [detection for detection in prev_results if detection.get(BBOX)]
+        direction_infos: Optional[List[Dict[str, float]]] = None
 
-                # Add direction information to detection
-                if OTHER not in detection:
-                    detection[OTHER] = {}
+        # ROI-batched flow when detections cover a small part of the frame
+        if self.roi_mode and detections:
+            mean_flows = self._compute_roi_mean_flows([detection[BBOX][:4] for detection in detections])
+            if mean_flows is not None:
+                direction_infos = self._directions_from_mean_flows(mean_flows)
 
-                detection[OTHER].update(direction_info)
+        # Otherwise compute full-frame optical flow using RAFT and frame history
+        if direction_infos is None:
+            optical_flow = self._compute_multi_frame_flow()
+            if optical_flow is not None:
+                direction_infos = self._estimate_directions_for_bboxes(
+                    self._to_flow_coords([detection[BBOX][:4] for detection in detections]), optical_flow
+                )
 
-                # Update class name with direction
-                class_name = detection.get(CLASS_NAME, "unknown")
-                direction = direction_info.get(self.DIRECTION, "unknown")
-                detection[CLASS_NAME] = f"{class_name} ({direction})"
+        # Process each detection
+        if direction_infos is not None:
+            self._apply_direction_infos(detections, direction_infos)
 
-                # Add model_id if not present
-                if MODEL_ID not in detection or not detection[MODEL_ID]:
-                    detection[MODEL_ID] = self.model_id
+        self._adapt_flow_updates((time.perf_counter() - start) * 1000.0)
 
         return prev_results
 
-    def reset_history(self):
-        """Reset the frame history (useful when starting a new video sequence)."""
-        self.frame_history.clear()
-        print(f"[RAFTDirectionEstimationStage3] Frame history cleared")
+    def _adapt_flow_updates(self, elapsed_ms: float) -> None:
+        """
+        Adjust num_flow_updates against the latency budget.
+
+        Steps down quickly while the smoothed latency is over budget and
+        steps up slowly while it is comfortably under, with a short cooldown
+        after each change so the average can settle.
+        """
+        if self.latency_budget_ms is None:
+            return
+
+        if self._latency_ema_ms is None:
+            self._latency_ema_ms = elapsed_ms
+        else:
+            alpha = self._LATENCY_EMA_ALPHA
+            self._latency_ema_ms = (1.0 - alpha) * self._latency_ema_ms + alpha * elapsed_ms
+
+        if self._adapt_cooldown > 0:
+            self._adapt_cooldown -= 1
+            return
+
+        updates = self.num_flow_updates
+        if self._latency_ema_ms > self.latency_budget_ms:
+            updates = max(self.min_flow_updates, updates - self._FLOW_UPDATES_STEP_DOWN)
+        elif self._latency_ema_ms < self.latency_budget_ms * self._LATENCY_HEADROOM:
+            updates = min(self.max_flow_updates, updates + self._FLOW_UPDATES_STEP_UP)
+
+        if updates != self.num_flow_updates:
+            self.num_flow_updates = updates
+            self._adapt_cooldown = self._ADAPT_COOLDOWN_FRAMES
@@ -0,0 +1,142 @@
+"""Manual benchmark comparing direction estimation stages and settings against full-resolution RAFT."""
+
+from __future__ import annotations
+
+import copy
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+
+from constants.detections_constant import OTHER
+from services.model.cfgs.ibase_stage import BaseStage
+from services.model.cfgs.stage1.general_object_detection_detector import GeneralObjectDetectorStage1
+from services.model.cfgs.stage3.base_direction_estimation_stage3 import BaseDirectionEstimationStage3
+from services.model.cfgs.stage3.opencv_flow_direction_estimation_stage3 import OpenCVFlowDirectionEstimationStage3
+from services.model.cfgs.stage3.raft_direction_estimation_stage3 import RAFTDirectionEstimationStage3
+
+VIDEO_URL_DEFAULT = "https://ai-public-videos.s3.us-east-2.amazonaws.com/Raw+Videos/Navirox/sorted/accident_left_2.mp4"
+MAX_FRAMES = 300
+REFERENCE = "raft_full"
+
+
+def _ensure_weights_path(name) -> Path:
+    weights_path = Path(__file__).resolve().parents[4] / "inferenced_weights" / name
+    if not weights_path.exists():
+        raise FileNotFoundError(
+            f"Expected detector weights at {weights_path}; please download or update the path."
+        )
+    return weights_path
+
+
+def _build_candidates() -> Dict[str, BaseStage]:
+    """Direction stages to compare; the REFERENCE entry is the baseline."""
+    return {
+        REFERENCE: RAFTDirectionEstimationStage3(
+            model_id="raft_full",
+        ),
+        "raft_half_res": RAFTDirectionEstimationStage3(
+            model_id="raft_half_res",
+            flow_scale=0.5,
+        ),
+        "raft_half_res_adaptive": RAFTDirectionEstimationStage3(
+            model_id="raft_half_res_adaptive",
+            flow_scale=0.5,
+            latency_budget_ms=40.0,
+        ),
+        "dis_half_res": OpenCVFlowDirectionEstimationStage3(
+            model_id="dis_half_res",
+            flow_backend="dis",
+            flow_scale=0.5,
+        ),
+        "farneback_half_res": OpenCVFlowDirectionEstimationStage3(
+            model_id="farneback_half_res",
+            flow_backend="farneback",
+            flow_scale=0.5,
+        ),
+    }
+
+
+def _angle_difference(a: float, b: float) -> float:
+    """Absolute difference between two angles in degrees, in [0, 180]."""
+    return abs((a - b + 180.0) % 360.0 - 180.0)
+
+
+def main(video_url: str = VIDEO_URL_DEFAULT, max_frames: int = MAX_FRAMES) -> None:
+    detector = GeneralObjectDetectorStage1(
+        model_path=str(_ensure_weights_path("navirox_obb.pt")),
+        model_id="navirox_obb.pt",
+        tag=["all"],
+    )
+    candidates = _build_candidates()
+
+    timings: Dict[str, List[float]] = {name: [] for name in candidates}
+    agreement: Dict[str, List[bool]] = {name: [] for name in candidates if name != REFERENCE}
+    angle_errors: Dict[str, List[float]] = {name: [] for name in candidates if name != REFERENCE}
+
+    capture = cv2.VideoCapture(video_url)
+    if not capture.isOpened():
+        raise RuntimeError(
+            f"OpenCV could not open the video at {video_url}. "
+            "Check your network connection or try downloading the file locally."
+        )
+
+    try:
+        for _ in range(max_frames):
+            ok, frame = capture.read()
+            if not ok:
+                print("Reached end of stream or encountered a read error.")
+                break
+
+            detections = detector(frame)
+
+            outputs: Dict[str, List[Dict[str, Any]]] = {}
+            for name, stage in candidates.items():
+                start = time.perf_counter()
+                outputs[name] = stage(frame, copy.deepcopy(detections))
+                timings[name].append((time.perf_counter() - start) * 1000.0)
+
+            reference = outputs[REFERENCE]
+            for name, results in outputs.items():
+                if name == REFERENCE:
+                    continue
+                for ref_det, det in zip(reference, results):
+                    ref_info = ref_det.get(OTHER, {})
+                    info = det.get(OTHER, {})
+                    if BaseDirectionEstimationStage3.DIRECTION not in ref_info:
+                        continue
+
+                    ref_direction = ref_info[BaseDirectionEstimationStage3.DIRECTION]
+                    direction = info.get(BaseDirectionEstimationStage3.DIRECTION)
+                    agreement[name].append(ref_direction == direction)
+
+                    if ref_direction != "stationary" and direction not in (None, "stationary"):
+                        angle_errors[name].append(
+                            _angle_difference(
+                                ref_info[BaseDirectionEstimationStage3.DIRECTION_ANGLE],
+                                info[BaseDirectionEstimationStage3.DIRECTION_ANGLE],
+                            )
+                        )
+    finally:
+        capture.release()
+
+    print(f"\n{'setting':<28}{'mean ms':>10}{'p95 ms':>10}{'agree %':>10}{'angle err':>12}")
+    for name, samples in timings.items():
+        mean_ms = float(np.mean(samples)) if samples else 0.0
+        p95_ms = float(np.percentile(samples, 95)) if samples else 0.0
+        if name == REFERENCE:
+            print(f"{name:<28}{mean_ms:>10.1f}{p95_ms:>10.1f}{'-':>10}{'-':>12}")
+            continue
+        agree = 100.0 * float(np.mean(agreement[name])) if agreement[name] else 0.0
+        err = float(np.mean(angle_errors[name])) if angle_errors[name] else 0.0
+        print(f"{name:<28}{mean_ms:>10.1f}{p95_ms:>10.1f}{agree:>10.1f}{err:>12.1f}")
+
+    for name, stage in candidates.items():
+        if isinstance(stage, RAFTDirectionEstimationStage3):
+            print(f"{name}: final num_flow_updates={stage.num_flow_updates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from constants.detections_constant import BBOX, CENTRE, DETECT_TRACK_ID
+from services.model.cfgs.stage3.base_direction_estimation_stage3 import BaseDirectionEstimationStage3
+
+
+class TrackKinematicsDirectionStage3(BaseDirectionEstimationStage3):
+    """
+    Stage 3 - Direction estimation from tracker centroids, without optical flow.
+
+    Keeps a short ring buffer of centres per track in preallocated arrays and
+    fits a least-squares velocity (pixels per frame) over all active tracks at
+    once. Requires a tracking stage upstream that sets track_id and centre;
+    detections without a track_id are left untouched.
+    """
+
+    def __init__(
+            self,
+            model_id: str,
+            speed_threshold: float = 0.5,
+            history_size: int = 8,
+            min_history: int = 3,
+            max_missed_frames: int = 30,
+            initial_capacity: int = 64,
+    ):
+        """
+        Initialize track-kinematics direction estimation stage.
+
+        Args:
+            model_id: Unique identifier for this stage
+            speed_threshold: Minimum speed in pixels per frame to consider as movement
+            history_size: Number of centres kept per track for the velocity fit
+            min_history: Minimum centres a track needs before a direction is emitted
+            max_missed_frames: Frames after which an unseen track is evicted
+            initial_capacity: Initial number of track rows; grows by doubling
+        """
+        super().__init__(model_id, flow_threshold=speed_threshold, frame_history_size=2)
+
+        self.history_size = max(2, history_size)
+        self.min_history = max(2, min(min_history, self.history_size))
+        self.max_missed_frames = max_missed_frames
+
+        self._frame_index = 0
+        self._allocate(max(1, initial_capacity))
+
+    def _allocate(self, capacity: int) -> None:
+        """Allocate empty track buffers with the given number of rows."""
+        self._centres = np.zeros((capacity, self.history_size, 2), dtype=np.float32)
+        self._frames = np.zeros((capacity, self.history_size), dtype=np.int64)
+        self._heads = np.zeros(capacity, dtype=np.int64)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        self._last_seen = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._row_track_ids: List[Optional[Hashable]] = [None] * capacity
+        self._rows: Dict[Hashable, int] = {}
+        self._free_rows: List[int] = list(range(capacity - 1, -1, -1))
+
+    def _grow(self) -> None:
+        """Double the number of track rows, keeping existing tracks in place."""
+        capacity = len(self._active)
+        new_capacity = capacity * 2
+
+        def grown(array: np.ndarray) -> np.ndarray:
+            out = np.zeros((new_capacity, *array.shape[1:]), dtype=array.dtype)
+            out[:capacity] = array
+            return out
+
+        self._centres = grown(self._centres)
+        self._frames = grown(self._frames)
+        self._heads = grown(self._heads)
+        self._counts = grown(self._counts)
+        self._last_seen = grown(self._last_seen)
+        self._active = grown(self._active)
+        self._row_track_ids.extend([None] * capacity)
+        self._free_rows.extend(range(new_capacity - 1, capacity - 1, -1))
+
+    def _row_for(self, track_id: Hashable) -> int:
+        """Return the buffer row of a track, claiming a free row for new tracks."""
+        row = self._rows.get(track_id)
+        if row is not None:
+            return row
+
+        if not self._free_rows:
+            self._grow()
+
+        row = self._free_rows.pop()
+        self._rows[track_id] = row
+        self._row_track_ids[row] = track_id
+        self._active[row] = True
+        self._heads[row] = 0
+        self._counts[row] = 0
+        return row
+
+    def _evict_stale_tracks(self) -> None:
+        """Release rows of tracks unseen for more than max_missed_frames."""
+        stale = np.flatnonzero(
+            self._active & (self._frame_index - self._last_seen > self.max_missed_frames)
+        )
+        for row in stale.tolist():
+            del self._rows[self._row_track_ids[row]]
+            self._row_track_ids[row] = None
+            self._free_rows.append(row)
+        self._active[stale] = False
+
+    def _fit_velocities(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Least-squares velocity fit of centre against frame index for each row.
+
+        Args:
+            rows: Buffer rows to fit
+
+        Returns:
+            len(rows) x 2 velocities (vx, vy) in pixels per frame
+        """
+        valid = (np.arange(self.history_size)[None, :] < self._counts[rows][:, None]).astype(np.float64)
+        samples = np.maximum(valid.sum(axis=1), 1.0)
+
+        t = self._frames[rows].astype(np.float64)
+        xy = self._centres[rows].astype(np.float64)
+
+        t_mean = (t * valid).sum(axis=1) / samples
+        xy_mean = (xy * valid[..., None]).sum(axis=1) / samples[:, None]
+
+        t_dev = (t - t_mean[:, None]) * valid
+        variance = (t_dev ** 2).sum(axis=1)
+        covariance = (t_dev[..., None] * (xy - xy_mean[:, None, :])).sum(axis=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            velocities = np.where(variance[:, None] > 0, covariance / variance[:, None], 0.0)
+        return velocities
+
+    def forward(
+            self, image: np.ndarray, prev_results: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run direction estimation on tracked detections from centroid history.
+
+        Args:
+            image: Input image (unused, kept for the stage interface)
+            prev_results: List of tracked detections from previous stage
+
+        Returns:
+            Updated list of detections with direction information added
+        """
+        self._frame_index += 1
+        self._evict_stale_tracks()
+
+        if not prev_results:
+            return []
+
+        detections = []
+        rows = []
+        centres = []
+        for detection in prev_results:
+            track_id = detection.get(DETECT_TRACK_ID)
+            if track_id is None:
+                continue
+
+            centre = detection.get(CENTRE)
+            if centre is None:
+                bbox = detection.get(BBOX)
+                if not bbox:
+                    continue
+                centre = ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+
+            detections.append(detection)
+            rows.append(self._row_for(track_id))
+            centres.append(centre[:2])
+
+        if not detections:
+            return prev_results
+
+        # Append this frame's centres to every track's ring buffer at once
+        rows = np.asarray(rows, dtype=np.int64)
+        heads = self._heads[rows]
+        self._centres[rows, heads] = np.asarray(centres, dtype=np.float32)
+        self._frames[rows, heads] = self._frame_index
+        self._heads[rows] = (heads + 1) % self.history_size
+        self._counts[rows] = np.minimum(self._counts[rows] + 1, self.history_size)
+        self._last_seen[rows] = self._frame_index
+
+        ready = self._counts[rows] >= self.min_history
+        if not ready.any():
+            return prev_results
+
+        velocities = self._fit_velocities(rows[ready])
+        ready_detections = [detection for detection, ok in zip(detections, ready.tolist()) if ok]
+        direction_infos = self._directions_from_mean_flows(velocities)
+        self._apply_direction_infos(ready_detections, direction_infos)
+
+        return prev_results
+
+    def reset_history(self):
+        """Drop all track histories (useful when starting a new video sequence)."""
+        super().reset_history()
+        self._frame_index = 0
+        self._allocate(len(self._active))
@@ -2,24 +2,25 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional, Tuple
 
 import cv2
+import numpy as np
 import torch
 
-from constants.detections_constant import BBOX, CLASS_ID, FOLLOWED_TO, \
-    DEFAULT_CLASS_ID
+from constants.detections_constant import BBOX, CENTRE, CLASS_ID, FOLLOWED_TO, \
+    DEFAULT_CLASS_ID, OTHER
 from services.common.models.pipe_structure import PipeStructure
 from services.model.cfgs.stage2.depth_estimation_stage2 import DepthEstimationStage2
 from services.model.cfgs.stage3.raft_direction_estimation_stage3 import RAFTDirectionEstimationStage3
-from services.visualization.detection_annotation_renderer import DetectionAnnotationRenderer
-from services.visualization.direction_annotation_renderer import DirectionAnnotationRenderer
 from services.visualization.iannotation_renderer import IAnnotationRenderer
 from services.managers.color_manager import ColorManager
+from services.managers.model_strategy_manager import ModelStrategyFactory
 from services.model.cfgs.stage1.general_object_detection_detector import GeneralObjectDetectorStage1
 from services.model.cfgs.model_pipeline import ModelPipeline
 
 VIDEO_URL_DEFAULT = "https://ai-public-videos.s3.us-east-2.amazonaws.com/Raw+Videos/Navirox/sorted/accident_left_2.mp4"
+DISPLAY_SIZE = (700, 1000)  # (width, height) of the preview window
 
 def _ensure_weights_path(name) -> Path:
     weights_path = Path(__file__).resolve().parents[2] / "inferenced_weights" / name
@@ -33,15 +34,24 @@ def _render_with_renderer(
     frame,
     detections: Iterable[dict],
     renderer: IAnnotationRenderer,
-    direction_renderer: IAnnotationRenderer,
     color_manager: ColorManager,
     regions: List,
+    scale: Optional[Tuple[float, float]] = None,
 ) -> None:
+    detections_to_render = _collect_detections_to_render(detections)
+    if scale is not None:
+        _to_display_space(detections_to_render, *scale)
+    renderer.render_frame(frame, detections_to_render, regions, color_manager)
+
+
+def _collect_detections_to_render(detections: Iterable[dict]) -> List[dict]:
+    """Flatten FOLLOWED_TO chains and normalise bbox/class_id for rendering."""
+    detections_to_render = []
     for detection in detections:
         detection_to_render = dict(detection)
         followed_to= detection.get(FOLLOWED_TO,[])
         if len(followed_to)!=0 :
-            _render_with_renderer(frame, followed_to, renderer, direction_renderer, color_manager, regions)
+            detections_to_render.extend(_collect_detections_to_render(followed_to))
             continue
         bbox = detection_to_render.get(BBOX)
         if bbox is not None:
@@ -51,13 +61,57 @@ def _render_with_renderer(
         if not isinstance(class_id_value, int):
             detection_to_render[CLASS_ID] = DEFAULT_CLASS_ID
 
-        renderer.render(frame, detection_to_render, regions, color_manager)
-        direction_renderer.render(frame, detection_to_render, regions, color_manager)
-
-
-
-
-def main(video_url: str = VIDEO_URL_DEFAULT) -> None:
+        detections_to_render.append(detection_to_render)
+    return detections_to_render
+
+
+def _to_display_space(detections: List[dict], scale_x: float, scale_y: float) -> None:
+    """
+    Scale bbox and centre of all detections into display coordinates in one op.
+    Direction angles are mapped through the same (anisotropic) scale so arrows
+    keep following the motion in the resized preview.
+    """
+    with_bbox = [d for d in detections if d.get(BBOX) is not None and len(d[BBOX]) >= 4]
+    if with_bbox:
+        boxes = np.asarray([d[BBOX][:4] for d in with_bbox], dtype=np.float32)
+        boxes = np.rint(boxes * np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)).astype(int)
+        for detection, box in zip(with_bbox, boxes.tolist()):
+            detection[BBOX] = box
+
+    with_centre = [d for d in detections if d.get(CENTRE) is not None]
+    if with_centre:
+        centres = np.asarray([d[CENTRE][:2] for d in with_centre], dtype=np.float32)
+        centres = np.rint(centres * np.array([scale_x, scale_y], dtype=np.float32)).astype(int)
+        for detection, centre in zip(with_centre, centres.tolist()):
+            detection[CENTRE] = centre
+
+    angle_key = RAFTDirectionEstimationStage3.DIRECTION_ANGLE
+    with_angle = [
+        d for d in detections if isinstance(d.get(OTHER), dict) and d[OTHER].get(angle_key) is not None
+    ]
+    if with_angle:
+        angles = np.radians(np.asarray([d[OTHER][angle_key] for d in with_angle], dtype=np.float64))
+        angles = np.degrees(np.arctan2(np.sin(angles) * scale_y, np.cos(angles) * scale_x))
+        for detection, angle in zip(with_angle, np.round(angles, 2).tolist()):
+            # Copy so the pipeline's own detection keeps its source-space angle
+            detection[OTHER] = {**detection[OTHER], angle_key: angle}
+
+
+
+
+def main(
+    video_url: str = VIDEO_URL_DEFAULT,
+    render_at_display_resolution: bool = True,
+    record_path: Optional[str] = None,
+) -> None:
+    """
+    Args:
+        video_url: Video source
+        render_at_display_resolution: Downscale the frame first and draw the
+            annotations in display space (cheaper than drawing full resolution)
+        record_path: Optional output video; recorded frames are annotated at
+            full resolution
+    """
 
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Running pipeline on device: {device}")
@@ -95,8 +149,8 @@ def main(video_url: str = VIDEO_URL_DEFAULT) -> None:
 
         ]
     )
-    renderer = DetectionAnnotationRenderer()
-    direction_renderer = DirectionAnnotationRenderer()
+    # Boxes and direction arrows in one composite renderer
+    renderer = ModelStrategyFactory.get_annotation_renderer("navirox_obb.pt")
     color_manager = ColorManager()
     regions: List = []
 
@@ -107,6 +161,7 @@ def main(video_url: str = VIDEO_URL_DEFAULT) -> None:
             "Check your network connection or try downloading the file locally."
         )
 
+    writer = None
     print("Press 'q' or ESC to exit the preview window.")
 
     try:
@@ -117,14 +172,34 @@ def main(video_url: str = VIDEO_URL_DEFAULT) -> None:
                 break
 
             detections: List[dict] = pipeline(frame)
-            _render_with_renderer(frame, detections, renderer, direction_renderer, color_manager, regions)
-            frame = cv2.resize(frame, (700, 1000))
-            cv2.imshow("Person, Fire, Smoke Detector", frame)
+
+            if record_path is not None:
+                # Recording needs full-resolution annotations
+                if writer is None:
+                    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+                    height, width = frame.shape[:2]
+                    writer = cv2.VideoWriter(record_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+                _render_with_renderer(frame, detections, renderer, color_manager, regions)
+                writer.write(frame)
+                display = cv2.resize(frame, DISPLAY_SIZE, interpolation=cv2.INTER_AREA)
+            elif render_at_display_resolution:
+                # Downscale first, then draw on the small frame in display coordinates
+                height, width = frame.shape[:2]
+                display = cv2.resize(frame, DISPLAY_SIZE, interpolation=cv2.INTER_AREA)
+                scale = (DISPLAY_SIZE[0] / width, DISPLAY_SIZE[1] / height)
+                _render_with_renderer(display, detections, renderer, color_manager, regions, scale)
+            else:
+                _render_with_renderer(frame, detections, renderer, color_manager, regions)
+                display = cv2.resize(frame, DISPLAY_SIZE)
+
+            cv2.imshow("Person, Fire, Smoke Detector", display)
             key = cv2.waitKey(1) & 0xFF
             if key in (ord("q"), 27):
                 break
     finally:
         capture.release()
+        if writer is not None:
+            writer.release()
 
 
 
@@ -12,6 +12,9 @@ class ITracker(ABC):
 
     tracker_name: str
 
+    # True when the tracker can associate plain detection dicts via
+    # track_detections(), independent of the detector model's own state
+    supports_detections: bool = False
 
 
     def track(
@@ -47,6 +50,24 @@ class ITracker(ABC):
         """
         pass
 
+    def track_detections(
+            self, detections: List[Dict[str, Any]], high_thresh: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Associate detections produced by any detector (optional).
+        Only available when supports_detections is True.
+
+        Args:
+            detections: Detections with BBOX, CONFIDENCE and CLASS_ID
+            high_thresh: Optional per-call score threshold for the
+                high-confidence association (tracker default when None)
+
+        Returns:
+            Detections that belong to a confirmed track, with DETECT_TRACK_ID
+            and CENTRE set
+        """
+        raise NotImplementedError(f"{self.tracker_name} does not support detection input")
+
     def reset(self) -> None:
         """
         Reset tracker state (optional).
@@ -0,0 +1,135 @@
+# services/trackers/kalman_filter.py
+from typing import Tuple
+import numpy as np
+
+
+class BatchedKalmanFilterXYAH:
+    """
+    Constant-velocity Kalman filter over many tracks at once.
+
+    State per track is (cx, cy, a, h, vcx, vcy, va, vh) where (cx, cy) is the
+    box centre, a the aspect ratio w / h and h the height. All methods take
+    stacked arrays: means (T x 8) and covariances (T x 8 x 8).
+    """
+
+    _NDIM = 4
+    _STD_WEIGHT_POSITION = 1.0 / 20
+    _STD_WEIGHT_VELOCITY = 1.0 / 160
+
+    def __init__(self):
+        ndim = self._NDIM
+        self._motion_mat = np.eye(2 * ndim)
+        self._motion_mat[:ndim, ndim:] = np.eye(ndim)
+        self._update_mat = np.eye(ndim, 2 * ndim)
+
+    def initiate(self, measurements: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Create tracks from unassociated measurements.
+
+        Args:
+            measurements: N x 4 boxes in (cx, cy, a, h) format
+
+        Returns:
+            (means, covariances) of shape N x 8 and N x 8 x 8
+        """
+        n = len(measurements)
+        means = np.zeros((n, 2 * self._NDIM))
+        means[:, :self._NDIM] = measurements
+
+        h = measurements[:, 3]
+        wp = self._STD_WEIGHT_POSITION
+        wv = self._STD_WEIGHT_VELOCITY
+        std = np.stack([
+            2 * wp * h, 2 * wp * h, np.full(n, 1e-2), 2 * wp * h,
+            10 * wv * h, 10 * wv * h, np.full(n, 1e-5), 10 * wv * h,
+        ], axis=1)
+        covariances = np.zeros((n, 2 * self._NDIM, 2 * self._NDIM))
+        idx = np.arange(2 * self._NDIM)
+        covariances[:, idx, idx] = std ** 2
+        return means, covariances
+
+    def predict(self, means: np.ndarray, covariances: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run the prediction step for all tracks.
+
+        Args:
+            means: T x 8 state means
+            covariances: T x 8 x 8 state covariances
+
+        Returns:
+            Predicted (means, covariances)
+        """
+        n = len(means)
+        h = means[:, 3]
+        wp = self._STD_WEIGHT_POSITION
+        wv = self._STD_WEIGHT_VELOCITY
+        std = np.stack([
+            wp * h, wp * h, np.full(n, 1e-2), wp * h,
+            wv * h, wv * h, np.full(n, 1e-5), wv * h,
+        ], axis=1)
+
+        means = means @ self._motion_mat.T
+        covariances = self._motion_mat @ covariances @ self._motion_mat.T
+        idx = np.arange(2 * self._NDIM)
+        covariances[:, idx, idx] += std ** 2
+        return means, covariances
+
+    def project(self, means: np.ndarray, covariances: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Project state distributions to measurement space.
+
+        Returns:
+            (projected means T x 4, innovation covariances T x 4 x 4)
+        """
+        n = len(means)
+        h = means[:, 3]
+        wp = self._STD_WEIGHT_POSITION
+        std = np.stack([wp * h, wp * h, np.full(n, 1e-1), wp * h], axis=1)
+
+        projected_means = means @ self._update_mat.T
+        projected_covs = self._update_mat @ covariances @ self._update_mat.T
+        idx = np.arange(self._NDIM)
+        projected_covs[:, idx, idx] += std ** 2
+        return projected_means, projected_covs
+
+    def update(
+            self, means: np.ndarray, covariances: np.ndarray, measurements: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run the correction step for matched tracks.
+
+        Args:
+            means: M x 8 predicted state means
+            covariances: M x 8 x 8 predicted state covariances
+            measurements: M x 4 associated measurements in (cx, cy, a, h) format
+
+        Returns:
+            Corrected (means, covariances)
+        """
+        projected_means, projected_covs = self.project(means, covariances)
+
+        # Kalman gain K = P H^T S^-1, solved as S K^T = H P
+        cross = covariances @ self._update_mat.T
+        gain = np.linalg.solve(projected_covs, cross.transpose(0, 2, 1)).transpose(0, 2, 1)
+
+        innovation = measurements - projected_means
+        means = means + (gain @ innovation[..., None])[..., 0]
+        covariances = covariances - gain @ projected_covs @ gain.transpose(0, 2, 1)
+        return means, covariances
+
+    @staticmethod
+    def xyxy_to_xyah(boxes: np.ndarray) -> np.ndarray:
+        """Convert N x 4 boxes from (x1, y1, x2, y2) to (cx, cy, a, h)."""
+        w = boxes[:, 2] - boxes[:, 0]
+        h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+        return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w / h, h], axis=1)
+
+    @staticmethod
+    def xyah_to_xyxy(states: np.ndarray) -> np.ndarray:
+        """Convert the (cx, cy, a, h) part of N x >=4 states to (x1, y1, x2, y2)."""
+        h = states[:, 3]
+        w = states[:, 2] * h
+        return np.stack([
+            states[:, 0] - w / 2, states[:, 1] - h / 2,
+            states[:, 0] + w / 2, states[:, 1] + h / 2,
+        ], axis=1)
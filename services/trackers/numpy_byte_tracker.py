@@ -0,0 +1,378 @@
+# services/trackers/numpy_byte_tracker.py
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from constants.detections_constant import (
+    BBOX, CONFIDENCE, CLASS_ID, DETECT_TRACK_ID, CENTRE
+)
+from services.trackers.base_tracker import BaseTracker
+from services.trackers.kalman_filter import BatchedKalmanFilterXYAH
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between two sets of boxes.
+
+    Args:
+        boxes_a: N x 4 boxes (x1, y1, x2, y2)
+        boxes_b: M x 4 boxes (x1, y1, x2, y2)
+
+    Returns:
+        N x M IoU matrix
+    """
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def linear_assignment(cost: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Solve a rectangular assignment problem, rejecting pairs above threshold.
+
+    Returns:
+        (matches M x 2 of (row, col), unmatched rows, unmatched cols)
+    """
+    rows_all = np.arange(cost.shape[0])
+    cols_all = np.arange(cost.shape[1])
+    if cost.size == 0:
+        return np.empty((0, 2), dtype=np.int64), rows_all, cols_all
+
+    rows, cols = linear_sum_assignment(cost)
+    keep = cost[rows, cols] <= threshold
+    matches = np.stack([rows[keep], cols[keep]], axis=1)
+    return (
+        matches,
+        np.setdiff1d(rows_all, matches[:, 0]),
+        np.setdiff1d(cols_all, matches[:, 1]),
+    )
+
+
+class NumpyByteTracker(BaseTracker):
+    """
+    Standalone ByteTrack implementation on NumPy arrays.
+
+    Unlike ByteTracker, which delegates to ultralytics model.track(), this
+    tracker consumes plain detection arrays (boxes, scores, classes), so it
+    works with any detector and keeps its state outside the model. Track
+    state is held as stacked arrays, and Kalman predict/update, IoU and
+    association run over all tracks at once.
+    """
+
+    TRACKED = 0
+    LOST = 1
+
+    supports_detections = True
+
+    _DEFAULT_CONFIG: Dict[str, Any] = {
+        "track_high_thresh": 0.5,
+        "track_low_thresh": 0.1,
+        "new_track_thresh": 0.6,
+        "match_thresh": 0.8,
+        "second_match_thresh": 0.5,
+        "unconfirmed_match_thresh": 0.7,
+        "track_buffer": 30,
+        "fuse_score": True,
+    }
+
+    def __init__(self, tracker_config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize ByteTrack.
+
+        Args:
+            tracker_config: Optional overrides for _DEFAULT_CONFIG keys
+        """
+        super().__init__(tracker_name="numpy_bytetrack")
+        self.config = {**self._DEFAULT_CONFIG, **(tracker_config or {})}
+        self.kalman_filter = BatchedKalmanFilterXYAH()
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all tracks and restart track ids."""
+        self.frame_id = 0
+        self._next_id = 1
+        self._means = np.zeros((0, 8))
+        self._covs = np.zeros((0, 8, 8))
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._states = np.zeros(0, dtype=np.int64)
+        self._activated = np.zeros(0, dtype=bool)
+        self._scores = np.zeros(0)
+        self._classes = np.zeros(0, dtype=np.int64)
+        self._end_frames = np.zeros(0, dtype=np.int64)
+        self.lost_track_ids: List[int] = []
+        self.removed_track_ids: List[int] = []
+
+    @property
+    def low_conf_threshold(self) -> float:
+        """Lowest detection score used by the second association."""
+        return self.config["track_low_thresh"]
+
+    @property
+    def active_track_ids(self) -> np.ndarray:
+        """Ids of confirmed tracks that are currently tracked."""
+        return self._ids[(self._states == self.TRACKED) & self._activated]
+
+    def _associate(
+            self,
+            track_idx: np.ndarray,
+            det_idx: np.ndarray,
+            track_boxes: np.ndarray,
+            boxes: np.ndarray,
+            scores: np.ndarray,
+            threshold: float,
+            fuse_score: bool,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Match a subset of tracks to a subset of detections by IoU.
+
+        Returns:
+            (matches M x 2 of (track index, detection index),
+             unmatched track indices, unmatched detection indices)
+        """
+        similarity = iou_matrix(track_boxes[track_idx], boxes[det_idx])
+        if fuse_score:
+            similarity = similarity * scores[det_idx][None, :]
+        matches, unmatched_t, unmatched_d = linear_assignment(1.0 - similarity, threshold)
+        pairs = np.stack([track_idx[matches[:, 0]], det_idx[matches[:, 1]]], axis=1)
+        return pairs, track_idx[unmatched_t], det_idx[unmatched_d]
+
+    def update(
+            self,
+            boxes: np.ndarray,
+            scores: np.ndarray,
+            class_ids: Optional[np.ndarray] = None,
+            high_thresh: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        Advance the tracker by one frame.
+
+        Args:
+            boxes: N x 4 detection boxes (x1, y1, x2, y2)
+            scores: N detection confidences
+            class_ids: Optional N class ids
+            high_thresh: Per-call override of config["track_high_thresh"]
+
+        Returns:
+            N track ids aligned with the input detections; -1 for detections
+            that are not (yet) part of a confirmed, tracked track
+        """
+        cfg = self.config
+        self.frame_id += 1
+        self.lost_track_ids = []
+        self.removed_track_ids = []
+
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        class_ids = (
+            np.zeros(len(boxes), dtype=np.int64) if class_ids is None
+            else np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        )
+        output_ids = np.full(len(boxes), -1, dtype=np.int64)
+
+        if high_thresh is None:
+            high_thresh = cfg["track_high_thresh"]
+        high = np.flatnonzero(scores >= high_thresh)
+        low = np.flatnonzero((scores > cfg["track_low_thresh"]) & (scores < high_thresh))
+
+        # Predict all tracks at once; lost tracks do not keep growing in height
+        if len(self._means):
+            self._means[self._states == self.LOST, 7] = 0.0
+            self._means, self._covs = self.kalman_filter.predict(self._means, self._covs)
+        track_boxes = self.kalman_filter.xyah_to_xyxy(self._means)
+
+        tracked = self._states == self.TRACKED
+        pool = np.flatnonzero((tracked & self._activated) | (self._states == self.LOST))
+        unconfirmed = np.flatnonzero(tracked & ~self._activated)
+
+        # First association: confirmed and lost tracks with high-score detections
+        matches_1, remaining_tracks, remaining_high = self._associate(
+            pool, high, track_boxes, boxes, scores, cfg["match_thresh"], cfg["fuse_score"]
+        )
+
+        # Second association: still-tracked leftovers with low-score detections
+        remaining_tracked = remaining_tracks[self._states[remaining_tracks] == self.TRACKED]
+        matches_2, unmatched_tracked, _ = self._associate(
+            remaining_tracked, low, track_boxes, boxes, scores, cfg["second_match_thresh"], False
+        )
+
+        # Unconfirmed tracks get one chance against the remaining high-score detections
+        matches_3, unmatched_unconfirmed, new_candidates = self._associate(
+            unconfirmed, remaining_high, track_boxes, boxes, scores,
+            cfg["unconfirmed_match_thresh"], cfg["fuse_score"],
+        )
+
+        # Kalman update for every matched track at once
+        matches = np.concatenate([matches_1, matches_2, matches_3])
+        if len(matches):
+            t_idx, d_idx = matches[:, 0], matches[:, 1]
+            measurements = self.kalman_filter.xyxy_to_xyah(boxes[d_idx])
+            self._means[t_idx], self._covs[t_idx] = self.kalman_filter.update(
+                self._means[t_idx], self._covs[t_idx], measurements
+            )
+            self._states[t_idx] = self.TRACKED
+            self._activated[t_idx] = True
+            self._scores[t_idx] = scores[d_idx]
+            self._classes[t_idx] = class_ids[d_idx]
+            self._end_frames[t_idx] = self.frame_id
+            output_ids[d_idx] = self._ids[t_idx]
+
+        # Tracked tracks without a match become lost
+        self.lost_track_ids = self._ids[unmatched_tracked].tolist()
+        self._states[unmatched_tracked] = self.LOST
+
+        # Drop unconfirmed tracks that were not re-detected and lost tracks past the buffer
+        remove = np.zeros(len(self._ids), dtype=bool)
+        remove[unmatched_unconfirmed] = True
+        remove |= (self._states == self.LOST) & (self.frame_id - self._end_frames > cfg["track_buffer"])
+        if remove.any():
+            self.removed_track_ids = self._ids[remove].tolist()
+            self._keep(~remove)
+
+        # Start new tracks from confident unmatched detections
+        new_dets = new_candidates[scores[new_candidates] >= cfg["new_track_thresh"]]
+        if len(new_dets):
+            new_ids = self._append(boxes[new_dets], scores[new_dets], class_ids[new_dets])
+            if self.frame_id == 1:
+                output_ids[new_dets] = new_ids
+
+        return output_ids
+
+    def _keep(self, mask: np.ndarray) -> None:
+        """Compact track arrays to the rows selected by mask."""
+        self._means = self._means[mask]
+        self._covs = self._covs[mask]
+        self._ids = self._ids[mask]
+        self._states = self._states[mask]
+        self._activated = self._activated[mask]
+        self._scores = self._scores[mask]
+        self._classes = self._classes[mask]
+        self._end_frames = self._end_frames[mask]
+
+    def _append(self, boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray) -> np.ndarray:
+        """Create tracks for new detections and return their ids."""
+        n = len(boxes)
+        means, covs = self.kalman_filter.initiate(self.kalman_filter.xyxy_to_xyah(boxes))
+        new_ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        self._next_id += n
+
+        # Tracks born on the first frame are confirmed immediately (as in ByteTrack)
+        activated = np.full(n, self.frame_id == 1)
+
+        self._means = np.concatenate([self._means, means])
+        self._covs = np.concatenate([self._covs, covs])
+        self._ids = np.concatenate([self._ids, new_ids])
+        self._states = np.concatenate([self._states, np.full(n, self.TRACKED, dtype=np.int64)])
+        self._activated = np.concatenate([self._activated, activated])
+        self._scores = np.concatenate([self._scores, scores])
+        self._classes = np.concatenate([self._classes, class_ids])
+        self._end_frames = np.concatenate([self._end_frames, np.full(n, self.frame_id, dtype=np.int64)])
+        return new_ids
+
+    def track_detections(
+            self, detections: List[Dict[str, Any]], high_thresh: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Track detection dicts produced by any detector stage.
+
+        Args:
+            detections: Detections with BBOX, CONFIDENCE and CLASS_ID
+            high_thresh: Per-call override of config["track_high_thresh"]
+
+        Returns:
+            Detections that belong to a confirmed track, with DETECT_TRACK_ID
+            and CENTRE set
+        """
+        if detections:
+            boxes = np.asarray([detection[BBOX][:4] for detection in detections], dtype=np.float64)
+            scores = np.asarray([detection.get(CONFIDENCE, 0.0) for detection in detections])
+            class_ids = np.asarray([detection.get(CLASS_ID, 0) for detection in detections])
+        else:
+            boxes, scores, class_ids = np.zeros((0, 4)), np.zeros(0), np.zeros(0)
+
+        track_ids = self.update(boxes, scores, class_ids, high_thresh=high_thresh)
+
+        tracked = []
+        for detection, track_id in zip(detections, track_ids.tolist()):
+            if track_id < 0:
+                continue
+            bbox = detection[BBOX]
+            detection[DETECT_TRACK_ID] = track_id
+            detection[CENTRE] = [int((bbox[0] + bbox[2]) / 2), int((bbox[1] + bbox[3]) / 2)]
+            tracked.append(detection)
+        return tracked
+
+    def track(
+            self,
+            frame: np.ndarray,
+            model: Any,
+            device: str,
+            persist: bool = True,
+            conf: float = 0.5,
+            **kwargs
+    ) -> List[Dict[str, Any]]:
+        """
+        Detect with the model, then associate with the NumPy ByteTrack.
+
+        Args:
+            frame: Input frame
+            model: YOLO model object, used for detection only
+            device: Device to run on
+            persist: Persist tracks across frames; False resets the tracker first
+            conf: Confidence threshold for the high-score association
+            **kwargs: Additional parameters (model_id, tag, classes)
+
+        Returns:
+            List of detections with tracking IDs
+        """
+        model_id = kwargs.get('model_id', 'unknown')
+        tag = kwargs.get('tag', ['all'])
+        classes = kwargs.get('classes', None)
+
+        if not persist:
+            self.reset()
+
+        # Low-score detections are needed for ByteTrack's second association
+        results = model.predict(
+            frame,
+            device=device,
+            verbose=False,
+            conf=self.config["track_low_thresh"],
+            classes=classes,
+        )
+        if not results or results[0].boxes is None:
+            self.update(np.zeros((0, 4)), np.zeros(0), high_thresh=conf)
+            return []
+
+        result = results[0]
+        track_ids = self.update(
+            result.boxes.xyxy.cpu().numpy(),
+            result.boxes.conf.cpu().numpy(),
+            result.boxes.cls.cpu().numpy(),
+            high_thresh=conf,
+        )
+
+        detections = []
+        for i, box in enumerate(result.boxes):
+            if track_ids[i] < 0:
+                continue
+            detection = self._process_detection(
+                box=box,
+                result=result,
+                i=i,
+                track_id=int(track_ids[i]),
+                model_id=model_id,
+                tag=tag
+            )
+            if detection is not None:
+                detections.append(detection)
+
+        return detections
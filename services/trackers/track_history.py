@@ -0,0 +1,312 @@
+# services/trackers/track_history.py
+import time
+from typing import List, Dict, Any, Hashable, Iterable, Optional, Tuple
+import numpy as np
+from constants.detections_constant import BBOX, CONFIDENCE, DETECT_TRACK_ID, CENTRE, OTHER
+
+
+class TrackHistoryStore:
+    """
+    Recent per-track history kept in preallocated NumPy ring buffers.
+
+    Each track owns one row holding its last history_size samples of
+    timestamp, bbox, centre, distance and confidence. Appending a sample is
+    O(1) per track and queries such as "last k centres" run over all
+    active tracks at once. Rows are released when the tracker reports a
+    track as removed (see sync_with_tracker), when a track stays idle for
+    max_idle_seconds, or when max_tracks is reached (least recently updated
+    first), so memory stays bounded on long-running streams.
+    """
+
+    DISTANCE = "distance"
+
+    def __init__(
+            self,
+            history_size: int = 32,
+            initial_capacity: int = 64,
+            max_tracks: int = 4096,
+            max_idle_seconds: Optional[float] = 60.0,
+    ):
+        """
+        Initialize track history store.
+
+        Args:
+            history_size: Number of samples kept per track
+            initial_capacity: Initial number of track rows; grows by doubling
+            max_tracks: Hard limit on track rows
+            max_idle_seconds: Evict tracks not updated for this long
+                (None keeps them until the tracker removes them)
+        """
+        self.history_size = max(1, history_size)
+        self.max_tracks = max(1, max_tracks)
+        self.max_idle_seconds = max_idle_seconds
+        self._allocate(min(max(1, initial_capacity), self.max_tracks))
+
+    def _allocate(self, capacity: int) -> None:
+        """Allocate empty buffers with the given number of rows."""
+        h = self.history_size
+        self._timestamps = np.zeros((capacity, h), dtype=np.float64)
+        self._bboxes = np.zeros((capacity, h, 4), dtype=np.float32)
+        self._centres = np.zeros((capacity, h, 2), dtype=np.float32)
+        self._distances = np.full((capacity, h), np.nan, dtype=np.float32)
+        self._confidences = np.zeros((capacity, h), dtype=np.float32)
+        self._heads = np.zeros(capacity, dtype=np.int64)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        self._last_update = np.zeros(capacity, dtype=np.float64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._row_track_ids: List[Optional[Hashable]] = [None] * capacity
+        self._rows: Dict[Hashable, int] = {}
+        self._free_rows: List[int] = list(range(capacity - 1, -1, -1))
+
+    def _grow(self) -> None:
+        """Double the number of rows (up to max_tracks), keeping existing tracks in place."""
+        capacity = len(self._active)
+        new_capacity = min(capacity * 2, self.max_tracks)
+
+        def grown(array: np.ndarray, fill: float = 0) -> np.ndarray:
+            out = np.full((new_capacity, *array.shape[1:]), fill, dtype=array.dtype)
+            out[:capacity] = array
+            return out
+
+        self._timestamps = grown(self._timestamps)
+        self._bboxes = grown(self._bboxes)
+        self._centres = grown(self._centres)
+        self._distances = grown(self._distances, np.nan)
+        self._confidences = grown(self._confidences)
+        self._heads = grown(self._heads)
+        self._counts = grown(self._counts)
+        self._last_update = grown(self._last_update)
+        self._active = grown(self._active)
+        self._row_track_ids.extend([None] * (new_capacity - capacity))
+        self._free_rows.extend(range(new_capacity - 1, capacity - 1, -1))
+
+    def _row_for(self, track_id: Hashable, timestamp: float, claimed: set) -> int:
+        """
+        Return the row of a track, claiming a free row for new tracks.
+
+        Args:
+            track_id: Track id
+            timestamp: Frame timestamp
+            claimed: Rows already used by the current batch; they are never
+                recycled, and the returned row is added to it
+
+        Returns:
+            Row index, or -1 when max_tracks rows are all used by this batch
+        """
+        row = self._rows.get(track_id)
+        if row is not None:
+            self._last_update[row] = timestamp
+            claimed.add(row)
+            return row
+
+        if not self._free_rows:
+            if len(self._active) < self.max_tracks:
+                self._grow()
+            else:
+                # At the limit: recycle the least recently updated track of an earlier batch
+                candidates = np.flatnonzero(self._active)
+                candidates = candidates[~np.isin(candidates, list(claimed))]
+                if len(candidates) == 0:
+                    return -1
+                self._release(int(candidates[np.argmin(self._last_update[candidates])]))
+
+        row = self._free_rows.pop()
+        self._rows[track_id] = row
+        self._row_track_ids[row] = track_id
+        self._active[row] = True
+        self._heads[row] = 0
+        self._counts[row] = 0
+        self._distances[row] = np.nan
+        self._last_update[row] = timestamp
+        claimed.add(row)
+        return row
+
+    def _release(self, row: int) -> None:
+        """Free a single row."""
+        del self._rows[self._row_track_ids[row]]
+        self._row_track_ids[row] = None
+        self._active[row] = False
+        self._free_rows.append(row)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, track_id: Hashable) -> bool:
+        return track_id in self._rows
+
+    @property
+    def track_ids(self) -> List[Hashable]:
+        """Ids of all tracks with history."""
+        return list(self._rows)
+
+    def append(
+            self,
+            track_ids: Iterable[Hashable],
+            bboxes: np.ndarray,
+            confidences: Optional[np.ndarray] = None,
+            distances: Optional[np.ndarray] = None,
+            timestamp: Optional[float] = None,
+    ) -> None:
+        """
+        Append one sample per track for the current frame.
+
+        Args:
+            track_ids: N track ids (unique within the frame); tracks beyond
+                max_tracks new ids in one frame are skipped
+            bboxes: N x 4 boxes (x1, y1, x2, y2)
+            confidences: Optional N confidences
+            distances: Optional N distances in metres (NaN when unknown)
+            timestamp: Frame timestamp in seconds (defaults to time.monotonic())
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        track_ids = list(track_ids)
+        if not track_ids:
+            self._evict_idle(timestamp)
+            return
+
+        bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        claimed: set = set()
+        rows = np.asarray([self._row_for(track_id, timestamp, claimed) for track_id in track_ids], dtype=np.int64)
+
+        stored = rows >= 0
+        if not stored.all():
+            print(f"[TrackHistoryStore] {int((~stored).sum())} tracks skipped: "
+                  f"frame has more than max_tracks={self.max_tracks} tracks")
+            rows = rows[stored]
+            bboxes = bboxes[stored]
+            if confidences is not None:
+                confidences = np.asarray(confidences)[stored]
+            if distances is not None:
+                distances = np.asarray(distances)[stored]
+        heads = self._heads[rows]
+
+        self._timestamps[rows, heads] = timestamp
+        self._bboxes[rows, heads] = bboxes
+        self._centres[rows, heads, 0] = (bboxes[:, 0] + bboxes[:, 2]) / 2
+        self._centres[rows, heads, 1] = (bboxes[:, 1] + bboxes[:, 3]) / 2
+        self._confidences[rows, heads] = 0.0 if confidences is None else confidences
+        self._distances[rows, heads] = np.nan if distances is None else distances
+
+        self._heads[rows] = (heads + 1) % self.history_size
+        self._counts[rows] = np.minimum(self._counts[rows] + 1, self.history_size)
+
+        self._evict_idle(timestamp)
+
+    def append_detections(
+            self, detections: List[Dict[str, Any]], timestamp: Optional[float] = None
+    ) -> None:
+        """
+        Append tracked detections; detections without a track_id are skipped.
+
+        Args:
+            detections: Detections with DETECT_TRACK_ID and BBOX, optionally
+                CONFIDENCE and OTHER["distance"]
+            timestamp: Frame timestamp in seconds (defaults to time.monotonic())
+        """
+        tracked = [d for d in detections if d.get(DETECT_TRACK_ID) is not None and d.get(BBOX)]
+        if not tracked:
+            self._evict_idle(time.monotonic() if timestamp is None else timestamp)
+            return
+
+        distances = []
+        for detection in tracked:
+            distance = (detection.get(OTHER) or {}).get(self.DISTANCE)
+            distances.append(np.nan if distance is None else float(distance))
+
+        self.append(
+            [d[DETECT_TRACK_ID] for d in tracked],
+            np.asarray([d[BBOX][:4] for d in tracked], dtype=np.float32),
+            np.asarray([d.get(CONFIDENCE, 0.0) for d in tracked], dtype=np.float32),
+            np.asarray(distances, dtype=np.float32),
+            timestamp,
+        )
+
+    def evict(self, track_ids: Iterable[Hashable]) -> None:
+        """Drop the history of the given tracks."""
+        for track_id in track_ids:
+            row = self._rows.get(track_id)
+            if row is not None:
+                self._release(row)
+
+    def sync_with_tracker(self, tracker: Any) -> None:
+        """
+        Apply the tracker's per-frame events. Call once per frame after tracking.
+
+        Removed tracks are evicted. Lost tracks keep their history, since the
+        tracker may still recover them within its buffer.
+
+        Args:
+            tracker: Tracker exposing removed_track_ids (e.g. NumpyByteTracker);
+                trackers without events rely on idle eviction
+        """
+        self.evict(getattr(tracker, "removed_track_ids", ()))
+
+    def _evict_idle(self, now: float) -> None:
+        """Release rows of tracks not updated for more than max_idle_seconds."""
+        if self.max_idle_seconds is None:
+            return
+        idle = np.flatnonzero(self._active & (now - self._last_update > self.max_idle_seconds))
+        for row in idle.tolist():
+            self._release(row)
+
+    def reset(self) -> None:
+        """Drop all histories."""
+        self._allocate(len(self._active))
+
+    def last_k(
+            self, k: int, field: str = "centres", track_ids: Optional[Iterable[Hashable]] = None
+    ) -> Tuple[List[Hashable], np.ndarray, np.ndarray]:
+        """
+        Last k samples of a field for many tracks at once, oldest first.
+
+        Args:
+            k: Number of samples (clamped to history_size)
+            field: One of "timestamps", "bboxes", "centres", "distances", "confidences"
+            track_ids: Tracks to query (defaults to all tracks)
+
+        Returns:
+            (track ids, values T x k [x D], valid mask T x k). Missing samples
+            are left-padded and marked invalid, so the newest sample of every
+            track is at index -1.
+        """
+        buffers = {
+            "timestamps": self._timestamps,
+            "bboxes": self._bboxes,
+            "centres": self._centres,
+            "distances": self._distances,
+            "confidences": self._confidences,
+        }
+        if field not in buffers:
+            raise ValueError(f"Unknown history field: '{field}'. Available fields: {', '.join(buffers)}")
+        buffer = buffers[field]
+
+        k = max(1, min(k, self.history_size))
+        if track_ids is None:
+            ids = list(self._rows)
+        else:
+            ids = [track_id for track_id in track_ids if track_id in self._rows]
+        rows = np.asarray([self._rows[track_id] for track_id in ids], dtype=np.int64)
+
+        # Slot j (0 = oldest of the k) sits k - j samples behind the head
+        offsets = np.arange(k - 1, -1, -1)
+        slots = (self._heads[rows][:, None] - 1 - offsets[None, :]) % self.history_size
+        valid = offsets[None, :] < self._counts[rows][:, None]
+
+        values = buffer[rows[:, None], slots]
+        return ids, values, valid
+
+    def latest(self, track_id: Hashable) -> Optional[Dict[str, Any]]:
+        """Most recent sample of one track, or None if it has no history."""
+        row = self._rows.get(track_id)
+        if row is None or self._counts[row] == 0:
+            return None
+        slot = (self._heads[row] - 1) % self.history_size
+        distance = float(self._distances[row, slot])
+        return {
+            "timestamp": float(self._timestamps[row, slot]),
+            BBOX: self._bboxes[row, slot].tolist(),
+            CENTRE: self._centres[row, slot].tolist(),
+            CONFIDENCE: float(self._confidences[row, slot]),
+            self.DISTANCE: None if np.isnan(distance) else distance,
+        }
@@ -0,0 +1,29 @@
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from services.common.models.pipe_structure import Region
+from services.managers.color_manager import ColorManager
+from services.visualization.iannotation_renderer import IAnnotationRenderer
+
+
+class CompositeAnnotationRenderer(IAnnotationRenderer):
+    """
+    Runs several renderers as one, in order (e.g. boxes first, then direction arrows).
+    Each child gets the whole detection batch through its render_frame().
+    """
+
+    def __init__(self, renderers: Sequence[IAnnotationRenderer]):
+        self.renderers = tuple(renderers)
+
+    def render(self, frame: np.ndarray, detection: Dict[str, Any], regions: List[Region],
+               color_manager: ColorManager, **kwargs) -> np.ndarray:
+        for renderer in self.renderers:
+            frame = renderer.render(frame, detection, regions, color_manager, **kwargs)
+        return frame
+
+    def render_frame(self, frame: np.ndarray, detections: List[Dict[str, Any]], regions: List[Region],
+                     color_manager: ColorManager, **kwargs) -> np.ndarray:
+        for renderer in self.renderers:
+            frame = renderer.render_frame(frame, detections, regions, color_manager, **kwargs)
+        return frame
@@ -1,27 +1,21 @@
 from services.common.models.pipe_structure import Region
 
-from typing import Dict,Any,List
+from typing import Dict,Any,List,Tuple
 import numpy as np
 import cv2
-from services.managers.color_manager import ColorManager
 from services.visualization.master_annotation_renderer import MasterAnnotationRenderer
 
 class DetectionAnnotationRenderer(MasterAnnotationRenderer):
-    def render(self, frame: np.ndarray, detection: Dict[str, Any], regions: List[Region],
-               color_manager: ColorManager, **kwargs) -> np.ndarray:
+    def _render_detection(self, frame: np.ndarray, detection: Dict[str, Any], regions: List[Region],
+                          color: Tuple[int, int, int], **kwargs) -> np.ndarray:
         bbox = detection.get("bbox", [0, 0, 0, 0])
         class_name = detection.get("class_name", "unknown")
         in_region = detection.get("in_region", False)
         region_name = detection.get("region_name", "")
         track_id = detection.get("track_id", -1)
         global_id = detection.get("global_id", "N/A")
-        class_id = detection.get("class_id", 0)
         confidence = detection.get("confidence", 0.5)
 
-        # Use consistent color for tracked objects, random for non-tracked
-        color_track_label = self.get_color_track(region_name, track_id,global_id)
-        color =  color_manager.get_color(color_track_label, class_id)
-
         cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
 
         if track_id != -1:
@@ -35,25 +29,18 @@ class DetectionAnnotationRenderer(MasterAnnotationRenderer):
         
 
 
-        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
-        cv2.rectangle(
-            frame,
-            (bbox[0], bbox[1] - label_size[1] - 10),
-            (bbox[0] + label_size[0], bbox[1]),
-            color,
-            -1
-        )
-        cv2.putText(
-            frame,
+        # Label box filled with the track color, white text, from the sprite cache
+        sprite = self._label_sprites.get(
             label,
-            (bbox[0], bbox[1] - 5),
             cv2.FONT_HERSHEY_SIMPLEX,
             0.5,
+            1,
             (255, 255, 255),
-            1
+            color,
+            pad_top=5,
+            pad_bottom=5,
         )
-        # Draw timestamp on the frame
-        frame = self._draw_timestamp(frame, **kwargs)
+        self._label_sprites.blit(frame, sprite, bbox[0], bbox[1] - 5)
         return frame
 
 
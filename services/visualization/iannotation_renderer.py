@@ -11,6 +11,13 @@ class IAnnotationRenderer(ABC):
                color_manager: ColorManager, **kwargs) -> np.ndarray:
         pass
 
+    def render_frame(self, frame: np.ndarray, detections: List[Dict[str, Any]], regions: List[Region],
+                     color_manager: ColorManager, **kwargs) -> np.ndarray:
+        """Render all detections of a frame. Override to batch per-frame work."""
+        for detection in detections:
+            frame = self.render(frame, detection, regions, color_manager, **kwargs)
+        return frame
+
     def get_color_track(self, region_name, track_id,global_id):
         color_track_label = None
         if  len(region_name) >0 and  region_name != "global":
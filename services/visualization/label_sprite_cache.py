@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class LabelSprite(NamedTuple):
+    """Pre-rasterized label: BGRA pixels and the text origin inside the patch."""
+    pixels: np.ndarray
+    origin_x: int
+    origin_y: int
+    opaque: bool
+
+
+class LabelSpriteCache:
+    """
+    LRU cache of pre-rasterized text labels (text plus optional background box).
+
+    Labels repeat heavily across frames, so each distinct (text, font, color,
+    padding) combination is drawn once with OpenCV into a small BGRA patch
+    and afterwards only copied into frames. Opaque sprites are a plain slice
+    assignment; sprites without a background are alpha blended.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Args:
+            max_size: Maximum number of cached sprites
+        """
+        self.max_size = max(1, max_size)
+        self._sprites: "OrderedDict[tuple, LabelSprite]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sprites)
+
+    def clear(self) -> None:
+        self._sprites.clear()
+
+    def get(
+        self,
+        text: str,
+        font: int,
+        font_scale: float,
+        thickness: int,
+        text_color: Tuple[int, int, int],
+        bg_color: Optional[Tuple[int, int, int]] = None,
+        pad_x: int = 0,
+        pad_top: int = 0,
+        pad_bottom: int = 0,
+        below_baseline: bool = False,
+        line_type: int = cv2.LINE_8,
+    ) -> LabelSprite:
+        """
+        Return the sprite for a label, rasterizing it on a cache miss.
+
+        Args:
+            text: Label text
+            font, font_scale, thickness, line_type: cv2.putText parameters
+            text_color: Text color (BGR)
+            bg_color: Background box color (BGR), or None for a transparent background
+            pad_x: Box padding left and right of the text
+            pad_top: Box padding above the text
+            pad_bottom: Box padding below the baseline
+            below_baseline: Extend the box by the font baseline (descenders)
+
+        Returns:
+            LabelSprite whose (origin_x, origin_y) is the putText origin within the patch
+        """
+        key = (
+            text, font, font_scale, thickness, tuple(text_color),
+            None if bg_color is None else tuple(bg_color),
+            pad_x, pad_top, pad_bottom, below_baseline, line_type,
+        )
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            return sprite
+
+        sprite = self._rasterize(
+            text, font, font_scale, thickness, text_color, bg_color,
+            pad_x, pad_top, pad_bottom, below_baseline, line_type,
+        )
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.max_size:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    @staticmethod
+    def _rasterize(
+        text: str,
+        font: int,
+        font_scale: float,
+        thickness: int,
+        text_color: Tuple[int, int, int],
+        bg_color: Optional[Tuple[int, int, int]],
+        pad_x: int,
+        pad_top: int,
+        pad_bottom: int,
+        below_baseline: bool,
+        line_type: int,
+    ) -> LabelSprite:
+        """Draw a label into a new BGRA patch."""
+        (text_width, text_height), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+        width = max(1, text_width + 2 * pad_x)
+        height = max(1, pad_top + text_height + pad_bottom + (baseline if below_baseline else 0))
+        origin = (pad_x, pad_top + text_height)
+
+        pixels = np.empty((height, width, 4), dtype=np.uint8)
+        if bg_color is not None:
+            canvas = np.empty((height, width, 3), dtype=np.uint8)
+            canvas[:] = bg_color
+            cv2.putText(canvas, text, origin, font, font_scale, text_color, thickness, line_type)
+            pixels[..., :3] = canvas
+            pixels[..., 3] = 255
+        else:
+            # Coverage mask of the text becomes the alpha channel
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.putText(mask, text, origin, font, font_scale, 255, thickness, line_type)
+            pixels[..., :3] = text_color
+            pixels[..., 3] = mask
+
+        return LabelSprite(pixels, origin[0], origin[1], bg_color is not None)
+
+    @staticmethod
+    def blit(frame: np.ndarray, sprite: LabelSprite, x: int, y: int) -> np.ndarray:
+        """
+        Copy a sprite into a BGR frame so its text origin lands on (x, y).
+        Parts outside the frame are clipped.
+
+        Returns:
+            The frame (modified in place)
+        """
+        height, width = sprite.pixels.shape[:2]
+        top = y - sprite.origin_y
+        left = x - sprite.origin_x
+
+        frame_h, frame_w = frame.shape[:2]
+        y0, y1 = max(top, 0), min(top + height, frame_h)
+        x0, x1 = max(left, 0), min(left + width, frame_w)
+        if y0 >= y1 or x0 >= x1:
+            return frame
+
+        patch = sprite.pixels[y0 - top:y1 - top, x0 - left:x1 - left]
+        region = frame[y0:y1, x0:x1]
+        if sprite.opaque:
+            region[...] = patch[..., :3]
+        else:
+            alpha = patch[..., 3:4].astype(np.uint16)
+            blended = patch[..., :3] * alpha + region * (255 - alpha)
+            region[...] = ((blended + 127) // 255).astype(np.uint8)
+        return frame
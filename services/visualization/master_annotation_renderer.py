@@ -1,10 +1,11 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 import cv2
 import numpy as np
 from services.common.models.pipe_structure import Region
 from services.visualization.iannotation_renderer import IAnnotationRenderer
 from services.managers.color_manager import ColorManager
+from services.visualization.label_sprite_cache import LabelSpriteCache
 
 
 class MasterAnnotationRenderer(IAnnotationRenderer):
@@ -23,6 +24,9 @@ class MasterAnnotationRenderer(IAnnotationRenderer):
     _TIME_OFFSET_X = 10  # Offset from right edge
     _TIME_OFFSET_Y = 25  # Offset from top edge
 
+    # Pre-rasterized labels shared by all renderers
+    _label_sprites = LabelSpriteCache(max_size=1024)
+
     def render(
         self,
         frame: np.ndarray,
@@ -34,14 +38,56 @@ class MasterAnnotationRenderer(IAnnotationRenderer):
         **kwargs
     ) -> np.ndarray:
         """
-        Render method that should be overridden by subclasses.
-        Subclasses should call self._draw_timestamp() at the end of their render method.
+        Render a single detection followed by the timestamp.
+        Subclasses implement _render_detection(); the timestamp is drawn here.
         """
-        # This base implementation just draws the timestamp
-
+        color = color_manager.get_color(self._color_label(detection), detection.get("class_id", 0))
+        frame = self._render_detection(frame, detection, regions, color, **kwargs)
+        return self._draw_timestamp(frame, **kwargs)
 
+    def render_frame(
+        self,
+        frame: np.ndarray,
+        detections: List[Dict[str, Any]],
+        regions: List[Region],
+        color_manager: ColorManager,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Render all detections of a frame, then the timestamp exactly once.
+        Colors for the whole frame are looked up in one get_colors() call.
+        """
+        if detections:
+            colors = color_manager.get_colors(
+                [self._color_label(detection) for detection in detections],
+                [detection.get("class_id", 0) for detection in detections],
+            )
+            for detection, color in zip(detections, colors):
+                frame = self._render_detection(frame, detection, regions, tuple(map(int, color)), **kwargs)
         return self._draw_timestamp(frame, **kwargs)
 
+    def _render_detection(
+        self,
+        frame: np.ndarray,
+        detection: Dict[str, Any],
+        regions: List[Region],
+        color: Tuple[int, int, int],
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Draw one detection with the given color, without the timestamp.
+        The base implementation draws nothing.
+        """
+        return frame
+
+    def _color_label(self, detection: Dict[str, Any]) -> Optional[str]:
+        """Key used by the color manager for a detection."""
+        return self.get_color_track(
+            detection.get("region_name", ""),
+            detection.get("track_id", -1),
+            detection.get("global_id", "N/A"),
+        )
+
     def _draw_timestamp(
         self,
         frame: np.ndarray,
@@ -76,47 +122,22 @@ class MasterAnnotationRenderer(IAnnotationRenderer):
             # Format the timestamp string (e.g., "2024-01-15 14:30:25")
             time_text = dt.strftime("%Y-%m-%d %H:%M:%S")
 
-            # Get frame dimensions
-            h, w = frame.shape[:2]
-
-            # Calculate text size
-            (text_width, text_height), baseline = cv2.getTextSize(
+            # Background box and text come from the sprite cache; the text
+            # only changes once per second, so this is usually a copy
+            sprite = self._label_sprites.get(
                 time_text,
                 self._TIME_FONT,
                 self._TIME_FONT_SCALE,
-                self._TIME_FONT_THICKNESS
-            )
-
-            # Position at top left
-            text_x = self._TIME_OFFSET_X
-            text_y = self._TIME_OFFSET_Y
-
-            # Draw background rectangle
-            bg_x1 = text_x - self._TIME_PADDING
-            bg_y1 = text_y - text_height - self._TIME_PADDING
-            bg_x2 = text_x + text_width + self._TIME_PADDING
-            bg_y2 = text_y + baseline + self._TIME_PADDING
-
-            cv2.rectangle(
-                frame,
-                (bg_x1, bg_y1),
-                (bg_x2, bg_y2),
-                self._TIME_BG_COLOR,
-                -1
-            )
-
-            # Draw text
-            cv2.putText(
-                frame,
-                time_text,
-                (text_x, text_y),
-                self._TIME_FONT,
-                self._TIME_FONT_SCALE,
-                self._TIME_TEXT_COLOR,
                 self._TIME_FONT_THICKNESS,
-                cv2.LINE_AA
+                self._TIME_TEXT_COLOR,
+                self._TIME_BG_COLOR,
+                pad_x=self._TIME_PADDING,
+                pad_top=self._TIME_PADDING,
+                pad_bottom=self._TIME_PADDING,
+                below_baseline=True,
+                line_type=cv2.LINE_AA,
             )
-
+            self._label_sprites.blit(frame, sprite, self._TIME_OFFSET_X, self._TIME_OFFSET_Y)
 
         except (ValueError, TypeError, AttributeError) as e:
             # Silently fail if timestamp is invalid